@@ -0,0 +1,79 @@
+"""Асинхронный режим чтения под ASGI.
+
+В Django 3.2 синхронные вьюхи под ASGI выполняются в одном общем
+потоке процесса, поэтому медленный запрос к БД задерживает все
+остальные. Для чтения вьюха оборачивается в корутину, которая
+выполняет её в ограниченном пуле потоков, а изменяющие запросы идут
+прежним путём.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.permissions import SAFE_METHODS
+
+_executor = None
+
+
+def get_executor():
+    """Пул потоков для ORM, создаётся при первом запросе."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_READ_WORKERS,
+            thread_name_prefix='orm')
+    return _executor
+
+
+def run_view(view, request, *args, **kwargs):
+    """Выполнение и рендеринг ответа в потоке пула.
+
+    Сигналы начала и конца запроса закрывают соединения только
+    в общем потоке, поэтому соединения пула проверяются здесь.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Асинхронная обёртка: GET/HEAD/OPTIONS выполняются в пуле."""
+    thread_sensitive_view = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await thread_sensitive_view(request, *args, **kwargs)
+        # Контекст (замеры Server-Timing) переносится в поток пула
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(),
+            lambda: context.run(run_view, view, request, *args, **kwargs))
+
+    return wrapper
+
+
+def async_read_urls(urlpatterns, names):
+    """Замена вьюх перечисленных маршрутов на асинхронные обёртки.
+
+    Без ASYNC_READ_VIEWS (режим WSGI) маршруты не меняются.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return urlpatterns
+    return [
+        URLPattern(pattern.pattern, async_read_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
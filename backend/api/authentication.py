@@ -0,0 +1,58 @@
+"""Аутентификация по токену с кэшированием пользователя."""
+from hashlib import sha1
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# Поля пользователя в кэше: без хэша пароля и личных данных
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name',
+               'is_active', 'is_staff', 'is_superuser')
+
+
+def token_cache_key(key):
+    """Ключ кэша токена (сам токен в ключ не попадает)."""
+    return f'auth:token:{sha1(key.encode()).hexdigest()}'
+
+
+def invalidate_tokens(*keys):
+    """Удаление токенов из кэша."""
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def from_fields(model, values):
+    """Экземпляр модели из части полей, остальные догружаются из БД.
+
+    save() такого экземпляра обновляет только загруженные поля.
+    """
+    names = [field.attname for field in model._meta.concrete_fields
+             if field.attname in values]
+    return model.from_db(router.db_for_read(model), names,
+                         [values[name] for name in names])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, хранящая в кэше Django поля USER_FIELDS.
+
+    Пароль, почта и аватар в кэш не попадают и загружаются из БД
+    при обращении. Записи сбрасываются сигналами при удалении токена
+    (logout), сохранении пользователя (смена пароля, деактивация,
+    изменение профиля) и его удалении.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        values = cache.get(cache_key)
+        if values is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key,
+                      {field: getattr(user, field) for field in USER_FIELDS},
+                      settings.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        user = from_fields(get_user_model(), values)
+        token = from_fields(Token, {'key': key, 'user_id': user.id})
+        token.user = user
+        return user, token
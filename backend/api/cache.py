@@ -0,0 +1,126 @@
+"""Версионированный кэш: справочные эндпоинты, счётчики пагинации
+и ответы анонимным пользователям."""
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag, urlencode
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+ANONYMOUS_RESPONSES = 'anonymous'
+
+
+def version_key(model):
+    """Ключ счётчика версии данных модели или именованной группы."""
+    label = model if isinstance(model, str) else model._meta.label_lower
+    return f'version:{label}'
+
+
+def get_version(model):
+    """Текущая версия данных модели."""
+    cache.add(version_key(model), 1, None)
+    return cache.get(version_key(model), 1)
+
+
+def bump_version(model):
+    """Сдвиг версии: все ранее закэшированные ответы устаревают."""
+    try:
+        cache.incr(version_key(model))
+    except ValueError:
+        cache.set(version_key(model), 1, None)
+
+
+class ReferenceCacheMixin:
+    """Кэширование ответов list/retrieve с ETag и Cache-Control."""
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Ответ из кэша или от обработчика с сохранением в кэш."""
+        model = self.queryset.model
+        path = sha1(request.get_full_path().encode()).hexdigest()
+        key = (f'reference:{model._meta.label_lower}:'
+               f'{get_version(model)}:{path}')
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            etag = quote_etag(
+                sha1(JSONRenderer().render(response.data)).hexdigest())
+            cached = (response.data, etag)
+            cache.set(key, cached, settings.REFERENCE_CACHE_TIMEOUT)
+        data, etag = cached
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True,
+                            max_age=settings.REFERENCE_CACHE_MAX_AGE)
+        return response
+
+
+def invalidate_anonymous_responses():
+    """Сброс ответов анонимным пользователям после коммита транзакции."""
+    transaction.on_commit(lambda: bump_version(ANONYMOUS_RESPONSES))
+
+
+def normalized_query(request):
+    """Параметры запроса без учёта их порядка и порядка значений."""
+    return urlencode(sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+    ), doseq=True)
+
+
+class AnonymousCacheMixin:
+    """Кэширование полных ответов list/retrieve для анонимных пользователей.
+
+    Ответ не зависит от пользователя, поэтому хранится один на путь
+    и набор параметров; версия сбрасывается сигналами моделей,
+    попадающих в ответ.
+    """
+
+    anonymous_cache_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.anonymous_response(super().list, request,
+                                       *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.anonymous_response(super().retrieve, request,
+                                       *args, **kwargs)
+
+    def anonymous_cacheable(self, request):
+        """Можно ли отдать ответ из общего кэша анонимных ответов."""
+        return (not request.user.is_authenticated
+                and self.action in self.anonymous_cache_actions)
+
+    def anonymous_response(self, handler, request, *args, **kwargs):
+        """Ответ из кэша для анонимного пользователя."""
+        if not self.anonymous_cacheable(request):
+            return handler(request, *args, **kwargs)
+        path = sha1(
+            f'{request.path}?{normalized_query(request)}'.encode()
+        ).hexdigest()
+        key = (f'{ANONYMOUS_RESPONSES}:{get_version(ANONYMOUS_RESPONSES)}:'
+               f'{path}')
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data,
+                          settings.ANONYMOUS_CACHE_TIMEOUT)
+            return response
+        return Response(data)
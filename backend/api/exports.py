@@ -0,0 +1,132 @@
+"""Потоковая выгрузка списка покупок в разных форматах."""
+import csv
+from datetime import datetime
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+CHUNK_SIZE = 2000
+PDF_FONT = 'ShoppingListFont'
+
+
+class ShoppingListExporter:
+    """Базовый экспортер: текстовый файл."""
+
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def __init__(self, user, ingredients):
+        self.user = user
+        self.ingredients = ingredients
+        self.today = datetime.today()
+
+    @property
+    def filename(self):
+        return f'{self.user.username}_shopping_list.{self.extension}'
+
+    def rows(self):
+        """Строки выгрузки без загрузки всего запроса в память."""
+        for ingredient in self.ingredients.iterator(chunk_size=CHUNK_SIZE):
+            yield (ingredient['ingredient__name'],
+                   ingredient['ingredient__measurement_unit'],
+                   ingredient['amount'])
+
+    def header(self):
+        return (f'Список покупок для: {self.user.get_full_name()}\n\n'
+                f'Дата: {self.today:%Y-%m-%d}\n\n')
+
+    def footer(self):
+        return f'сформировано сервисом "Foodgram" ({self.today:%Y})'
+
+    def prepare(self):
+        """Проверки до отправки заголовков ответа."""
+
+    def stream(self):
+        """Итератор по частям файла."""
+        yield self.header().encode()
+        separator = ''
+        for name, unit, amount in self.rows():
+            yield f'{separator}- {name} ({unit}) - {amount}'.encode()
+            separator = '\n'
+        yield f'\n\n{self.footer()}'.encode()
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CsvExporter(ShoppingListExporter):
+    """Выгрузка в CSV."""
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def stream(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')).encode()
+        for row in self.rows():
+            yield writer.writerow(row).encode()
+
+
+class PdfExporter(ShoppingListExporter):
+    """Выгрузка в PDF.
+
+    Формат PDF требует таблицу ссылок в конце файла, поэтому документ
+    собирается во временный файл (в памяти до порога, дальше на диске)
+    и отдаётся из него частями.
+    """
+
+    extension = 'pdf'
+    content_type = 'application/pdf'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    def prepare(self):
+        """Регистрация шрифта: без него ответ оборвался бы после 200."""
+        if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT, settings.SHOPPING_LIST_PDF_FONT))
+
+    def stream(self):
+        with SpooledTemporaryFile(
+                max_size=settings.SHOPPING_LIST_SPOOL_SIZE) as file:
+            self.draw(file)
+            file.seek(0)
+            yield from iter(lambda: file.read(CHUNK_SIZE * 32), b'')
+
+    def draw(self, file):
+        """Отрисовка страниц документа."""
+        pdf = canvas.Canvas(file, pagesize=A4)
+        width, height = A4
+        lines = chain(
+            self.header().splitlines(),
+            (f'- {name} ({unit}) - {amount}'
+             for name, unit, amount in self.rows()),
+            ('', self.footer()),
+        )
+        y = height - self.margin
+        pdf.setFont(PDF_FONT, self.font_size)
+        for line in lines:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(PDF_FONT, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y, line)
+            y -= self.line_height
+        pdf.save()
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (ShoppingListExporter, CsvExporter, PdfExporter)
+}
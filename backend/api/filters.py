@@ -1,18 +1,24 @@
 from django_filters import ModelMultipleChoiceFilter
 from django_filters.rest_framework import FilterSet, filters
 
+from api.search import search_ingredients, search_recipes
 from recipes.models import Ingredient, Recipe, Tag
 
 
 class IngredientFilter(FilterSet):
     """Фильтр по названию для ингредиентов."""
     name = filters.CharFilter(lookup_expr='startswith')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         """Класс Meta."""
 
         model = Ingredient
-        fields = ['name']
+        fields = ['name', 'search']
+
+    def filter_search(self, queryset, name, value):
+        """Метод для поиска с ранжированием."""
+        return search_ingredients(queryset, value)
 
 
 class RecipeFilter(FilterSet):
@@ -24,13 +30,16 @@ class RecipeFilter(FilterSet):
         method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(choices=(('popular', 'Популярные'),),
+                                    method='filter_ordering')
 
     class Meta:
         """Класс Meta."""
 
         model = Recipe
         fields = ('author', 'tags', 'is_favorited',
-                  'is_in_shopping_cart')
+                  'is_in_shopping_cart', 'search', 'ordering')
 
     def filter_is_favorited(self, queryset, name, value):
         """Метод для избранного."""
@@ -45,3 +54,11 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_recipe__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Метод для поиска по названию и описанию."""
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Метод для сортировки по популярности."""
+        return queryset.order_by('-favorites_count', '-in_carts_count', '-id')
@@ -0,0 +1,245 @@
+"""Обработка загруженных изображений вне цикла запроса.
+
+Запрос только декодирует и проверяет изображение и сохраняет оригинал.
+После коммита транзакции пул потоков убирает из оригинала метаданные
+(EXIF, ICC, GPS) и строит уменьшенные копии в формате WebP, пути
+к которым записываются в поле миниатюр модели.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, ImageOps
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import Field
+
+from api.cache import invalidate_anonymous_responses
+
+logger = logging.getLogger(__name__)
+
+THUMBNAILS_DIR = 'thumbs'
+SOURCE_KEY = 'source'
+ORIGINAL_KEY = 'original'
+HASH_LENGTH = 12
+
+_executor = None
+
+
+class ImageUploadField(Base64ImageField):
+    """Base64-изображение с ограничением размера до декодирования."""
+
+    def to_internal_value(self, base64_data):
+        if (isinstance(base64_data, str)
+                and len(base64_data) * 3 // 4
+                > settings.IMAGE_MAX_UPLOAD_SIZE):
+            raise ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.IMAGE_MAX_UPLOAD_SIZE // 1024 // 1024} МБ.')
+        return super().to_internal_value(base64_data)
+
+
+def get_executor():
+    """Пул потоков обработки, создаётся при первой задаче."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='images')
+    return _executor
+
+
+def thumbnails_outdated(instance):
+    """Изображение сменилось с момента построения миниатюр."""
+    image = getattr(instance, instance.image_field)
+    thumbnails = getattr(instance, instance.thumbnails_field)
+    return bool(image) and thumbnails.get(SOURCE_KEY) != image.name
+
+
+def schedule_thumbnails(instance):
+    """Постановка обработки изображения в очередь после коммита."""
+    args = (type(instance), instance.pk,
+            getattr(instance, instance.image_field).name)
+    if settings.IMAGE_PROCESSING_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_thread, *args))
+    else:
+        transaction.on_commit(lambda: process_safely(*args))
+
+
+def process_safely(model, pk, name):
+    """Обработка с записью ошибки в лог вместо исключения."""
+    try:
+        process_image(model, pk, name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def run_in_thread(model, pk, name):
+    """Обработка в потоке пула с закрытием его соединения с БД."""
+    try:
+        process_safely(model, pk, name)
+    finally:
+        connection.close()
+
+
+def encode(image, image_format, **options):
+    """Кодирование изображения без метаданных."""
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def process_image(model, pk, name):
+    """Очистка оригинала и построение миниатюр WebP.
+
+    Результат записывается через update(), только если за время
+    обработки изображение объекта не заменили.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field = getattr(instance, model.image_field)
+    if field.name != name:
+        return
+    storage = field.storage
+    with storage.open(name, 'rb') as file:
+        content = file.read()
+    image = Image.open(BytesIO(content))
+    image_format = image.format
+    animated = getattr(image, 'is_animated', False)
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if image.has_transparency_data else 'RGB')
+    image.info = {}
+    cleaned = name
+    if not animated:
+        # Оригинал удаляется только после сохранения очищенной копии
+        # и записи её имени в объект.
+        file = encode(image, image_format, quality=settings.IMAGE_QUALITY)
+        content = file.read()
+        cleaned = storage.save(name, file)
+
+    stem = os.path.splitext(os.path.basename(name))[0]
+    directory = os.path.join(os.path.dirname(name), THUMBNAILS_DIR)
+    width, height = image.size
+    thumbnails = {
+        SOURCE_KEY: cleaned,
+        ORIGINAL_KEY: {'width': width, 'height': height,
+                       'hash': sha1(content).hexdigest()[:HASH_LENGTH]},
+    }
+    try:
+        for size in model.thumbnail_sizes:
+            thumbnail = image.copy()
+            thumbnail.thumbnail(settings.IMAGE_SIZES[size],
+                                Image.Resampling.LANCZOS)
+            width, height = thumbnail.size
+            thumbnails[size] = {
+                'path': storage.save(
+                    os.path.join(directory, f'{stem}_{size}.webp'),
+                    encode(thumbnail, 'WEBP',
+                           quality=settings.IMAGE_QUALITY)),
+                'width': width,
+                'height': height,
+            }
+        previous = getattr(instance, model.thumbnails_field)
+        updated = model.objects.filter(
+            pk=pk, **{model.image_field: name}
+        ).update(**{model.image_field: cleaned,
+                    model.thumbnails_field: thumbnails})
+    except Exception:
+        discard(model, storage, name, cleaned, thumbnails)
+        raise
+    if updated:
+        invalidate_anonymous_responses()
+        if cleaned != name:
+            storage.delete(name)
+        delete_thumbnails(model, storage, previous, keep=thumbnails)
+    else:
+        discard(model, storage, name, cleaned, thumbnails)
+
+
+def discard(model, storage, name, cleaned, thumbnails):
+    """Удаление файлов необработанного результата."""
+    if cleaned != name:
+        storage.delete(cleaned)
+    delete_thumbnails(model, storage, thumbnails)
+
+
+def thumbnail_paths(model, thumbnails):
+    """Пути к файлам миниатюр."""
+    return {thumbnails[size]['path'] for size in model.thumbnail_sizes
+            if thumbnails.get(size)}
+
+
+def delete_thumbnails(model, storage, thumbnails, keep=None):
+    """Удаление файлов миниатюр, кроме перечисленных в keep."""
+    kept = thumbnail_paths(model, keep or {})
+    for path in thumbnail_paths(model, thumbnails) - kept:
+        storage.delete(path)
+
+
+def absolute_url(url, request=None):
+    """Абсолютная ссылка, если известен запрос."""
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def image_url(instance, request=None):
+    """Ссылка на оригинал с хэшем содержимого для сброса кэша."""
+    image = getattr(instance, instance.image_field)
+    if not image:
+        return None
+    url = image.url
+    if not thumbnails_outdated(instance):
+        original = getattr(instance, instance.thumbnails_field).get(
+            ORIGINAL_KEY)
+        if original:
+            url = f'{url}?v={original["hash"]}'
+    return absolute_url(url, request)
+
+
+def thumbnail_urls(instance, request=None):
+    """Оригинал и миниатюры текущего изображения с размерами."""
+    image = getattr(instance, instance.image_field)
+    if not image or thumbnails_outdated(instance):
+        return {}
+    thumbnails = getattr(instance, instance.thumbnails_field)
+    result = {}
+    if thumbnails.get(ORIGINAL_KEY):
+        result[ORIGINAL_KEY] = {'url': image_url(instance, request),
+                                **thumbnails[ORIGINAL_KEY]}
+    for size in instance.thumbnail_sizes:
+        if thumbnails.get(size):
+            result[size] = {
+                'url': absolute_url(
+                    image.storage.url(thumbnails[size]['path']), request),
+                'width': thumbnails[size]['width'],
+                'height': thumbnails[size]['height'],
+            }
+    return result
+
+
+class ImageURLField(Field):
+    """Ссылка на изображение объекта без Base64-представления."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return image_url(instance, self.context.get('request'))
+
+
+class ThumbnailsField(ImageURLField):
+    """Ссылки на оригинал и миниатюры с шириной и высотой."""
+
+    def to_representation(self, instance):
+        return thumbnail_urls(instance, self.context.get('request'))
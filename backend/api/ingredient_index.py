@@ -0,0 +1,80 @@
+"""Индекс префиксов для поиска ингредиентов без обращения к БД."""
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный массив ключей поиска в памяти процесса.
+
+    Ключами служат название ингредиента целиком и каждое слово
+    названия, начиная со второго, в нижнем регистре. Совпадения
+    с начала названия идут в выдаче раньше совпадений по слову.
+    Индекс строится при первом запросе, сбрасывается сигналами
+    модели Ingredient и перестраивается не реже раза в TTL секунд,
+    чтобы подхватывать изменения из других процессов.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._keys = None
+        self._entries = None
+        self._built_at = 0
+
+    def invalidate(self):
+        """Сброс индекса, он перестроится при следующем запросе."""
+        with self._lock:
+            self._keys = None
+            self._entries = None
+
+    def _get_index(self):
+        """Ключи и записи индекса, при необходимости перестроенные."""
+        ttl = settings.INGREDIENT_INDEX_TTL
+        with self._lock:
+            if (self._keys is None
+                    or time.monotonic() - self._built_at > ttl):
+                self._build()
+            return self._keys, self._entries
+
+    def _build(self):
+        """Построение индекса по всей таблице ингредиентов."""
+        entries = []
+        for ingredient in Ingredient.objects.all():
+            name = ingredient.name.casefold()
+            entries.append((name, 0, ingredient))
+            words = name.split()
+            entries.extend((' '.join(words[i:]), 1, ingredient)
+                           for i in range(1, len(words)))
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+        self._built_at = time.monotonic()
+
+    def search(self, prefix, limit=None):
+        """Поиск ингредиентов по началу названия или слова в нём."""
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        prefix = prefix.casefold()
+        keys, entries = self._get_index()
+        hits = ([], [])
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            _, rank, ingredient = entries[i]
+            hits[rank].append(ingredient)
+        seen = set()
+        result = []
+        for ingredient in hits[0] + hits[1]:
+            if ingredient.pk not in seen:
+                seen.add(ingredient.pk)
+                result.append(ingredient)
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
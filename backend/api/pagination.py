@@ -1,7 +1,113 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from api.cache import get_version
 
 
 class CustomPaginator(PageNumberPagination):
     """Кастомный пагинатор."""
 
     page_size_query_param = 'limit'
+
+
+class CachedCountDjangoPaginator(Paginator):
+    """Paginator с кэшированным или оценочным числом объектов."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        estimate = self.estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+        model = queryset.model
+        key = 'count:{}:{}:{}'.format(
+            model._meta.label_lower, get_version(model),
+            sha1(f'{sql}{params}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Оценка планировщика Postgres для списка без фильтров."""
+        connection = connections[queryset.db]
+        if (connection.vendor != 'postgresql'
+                or queryset.query.where
+                or queryset.query.distinct):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return None
+        return row[0]
+
+
+class CachedCountPaginator(CustomPaginator):
+    """Пагинатор с кэшированием COUNT(*) по набору фильтров."""
+
+    django_paginator_class = CachedCountDjangoPaginator
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """Курсорная пагинация по id рецепта без подсчёта COUNT(*)."""
+
+    ordering = '-id'
+    page_size_query_param = 'limit'
+
+
+class RecipePaginator(CachedCountPaginator):
+    """Постраничная пагинация или курсорная по запросу.
+
+    Курсорный режим включается параметром ?pagination=cursor, ссылки
+    next/previous в нём содержат параметр cursor.
+    """
+
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def use_cursor(self, request):
+        """Выбран ли курсорный режим."""
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or RecipeCursorPaginator.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request):
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = RecipeCursorPaginator()
+        page = self.cursor_paginator.paginate_queryset(queryset, request,
+                                                       view)
+        self.display_page_controls = (
+            self.cursor_paginator.display_page_controls)
+        return page
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -0,0 +1,93 @@
+"""Разбор планов SQL-запросов эндпоинтов API (EXPLAIN ANALYZE)."""
+import json
+from contextlib import contextmanager
+
+from django.db import connection, reset_queries
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+
+# Порог строк для Seq Scan и Sort.
+ROWS = 1000
+
+# (имя, url, нужна ли авторизация)
+ENDPOINTS = (
+    ('recipes_list', '/api/recipes/?limit=6', False),
+    ('recipes_list_auth', '/api/recipes/?limit=6', True),
+    ('recipes_by_tags', '/api/recipes/?limit=6&tags=breakfast', True),
+    ('recipes_by_author', '/api/recipes/?limit=6&author={author}', True),
+    ('recipes_favorited', '/api/recipes/?limit=6&is_favorited=1', True),
+    ('recipes_in_cart', '/api/recipes/?limit=6&is_in_shopping_cart=1', True),
+    ('recipes_popular', '/api/recipes/?limit=6&ordering=popular', True),
+    ('recipe_detail', '/api/recipes/{recipe}/', True),
+    ('subscriptions',
+     '/api/users/subscriptions/?limit=6&recipes_limit=3', True),
+    ('users_list', '/api/users/?limit=6', True),
+    ('ingredients', '/api/ingredients/', False),
+    ('tags', '/api/tags/', False),
+    ('shopping_cart', '/api/recipes/shopping_cart/', True),
+    ('download_shopping_cart',
+     '/api/recipes/download_shopping_cart/?format=txt', True),
+)
+
+
+@contextmanager
+def client_environment():
+    """Окружение тестового клиента, если его ещё не настроил pytest."""
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        yield
+        return
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+
+
+def capture_selects(client, url):
+    """Ответ и различные SELECT-запросы, выполненные при запросе url.
+
+    Тестовый клиент шлёт request_started, а он очищает журнал запросов
+    соединения: запросы копируются сразу после ответа.
+    """
+    connection.ensure_connection()
+    reset_queries()
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url)
+    queries = list(captured)
+    selects = list(dict.fromkeys(
+        query['sql'] for query in queries
+        if query['sql'].lstrip().upper().startswith('SELECT')))
+    return response, len(queries), selects
+
+
+def explain(sql):
+    """План выполнения запроса с фактическими строками и буферами."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}')
+        result = cursor.fetchone()[0]
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]
+
+
+def find_problems(node, threshold=ROWS):
+    """Seq Scan, отбрасывающий большую часть строк, и Sort от порога."""
+    loops = node.get('Actual Loops', 1)
+    rows = node.get('Actual Rows', 0) * loops
+    if node['Node Type'] == 'Seq Scan':
+        removed = node.get('Rows Removed by Filter', 0) * loops
+        # Полный проход ради COUNT(*) или мелкой таблицы проблемой не считается
+        if rows + removed >= threshold and removed > rows:
+            yield (f'Seq Scan {node["Relation Name"]}: '
+                   f'{rows + removed} строк просмотрено, {rows} отобрано')
+    elif node['Node Type'] == 'Sort':
+        # Sort с LIMIT отдаёт несколько строк, важен объём на входе
+        sorted_rows = sum(child.get('Actual Rows', 0)
+                          * child.get('Actual Loops', 1)
+                          for child in node.get('Plans', ()))
+        if sorted_rows >= threshold:
+            yield (f'Sort {", ".join(node.get("Sort Key", []))}: '
+                   f'{sorted_rows} строк, {node.get("Sort Method", "")}')
+    for child in node.get('Plans', ()):
+        yield from find_problems(child, threshold)
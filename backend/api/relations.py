@@ -0,0 +1,65 @@
+"""Связи пользователя (избранное, покупки, подписки) в виде множеств id."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+FAVORITES, SHOPPING_CART, FOLLOWING = range(3)
+
+
+class UserRelations:
+    """Множества id избранных рецептов, рецептов в покупках и авторов."""
+
+    def __init__(self, favorites=(), shopping_cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.following = frozenset(following)
+
+
+def relations_key(user_id):
+    """Ключ кэша связей пользователя."""
+    return f'relations:{user_id}'
+
+
+def load_relations(user):
+    """Загрузка связей одним запросом (или из кэша)."""
+    if not user.is_authenticated:
+        return UserRelations()
+    timeout = settings.USER_RELATIONS_CACHE_TIMEOUT
+    if timeout:
+        relations = cache.get(relations_key(user.id))
+        if relations is not None:
+            return relations
+    kind = IntegerField()
+    rows = Favorite.objects.filter(user=user).order_by().values_list(
+        Value(FAVORITES, output_field=kind), 'recipe_id'
+    ).union(
+        ShoppingCart.objects.filter(user=user).order_by().values_list(
+            Value(SHOPPING_CART, output_field=kind), 'recipe_id'),
+        Subscribe.objects.filter(user=user).order_by().values_list(
+            Value(FOLLOWING, output_field=kind), 'author_id'),
+        all=True,
+    )
+    ids = ([], [], [])
+    for relation, object_id in rows:
+        ids[relation].append(object_id)
+    relations = UserRelations(*ids)
+    if timeout:
+        cache.set(relations_key(user.id), relations, timeout)
+    return relations
+
+
+def get_user_relations(request):
+    """Связи пользователя запроса, загружаемые один раз за запрос."""
+    if request is None:
+        return UserRelations()
+    if not hasattr(request, '_user_relations'):
+        request._user_relations = load_relations(request.user)
+    return request._user_relations
+
+
+def invalidate_user_relations(user_id):
+    """Сброс закэшированных связей пользователя."""
+    cache.delete(relations_key(user_id))
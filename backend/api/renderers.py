@@ -0,0 +1,49 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from api.exports import EXPORTERS
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Рендерер формата выгрузки списка покупок.
+
+    Сам файл отдаётся потоковым ответом, рендерер нужен для выбора
+    формата по ?format= и Accept, а также для ответов об ошибках.
+    """
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return JSONRenderer().render(data)
+
+
+SHOPPING_LIST_RENDERERS = tuple(
+    type(f'{extension.title()}Renderer', (ShoppingListRenderer,), {
+        'format': extension,
+        'media_type': exporter.content_type.split(';')[0],
+    })
+    for extension, exporter in EXPORTERS.items()
+)
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Выбор формата выгрузки без ответа 406.
+
+    Клиенты API, присылающие Accept: application/json, получали файл
+    до появления форматов и должны получать его и дальше: без совпадения
+    по Accept отдаётся формат из ?format=, а без него - текстовый файл.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers,
+                                           format_suffix)
+        except NotAcceptable:
+            format = format_suffix or request.query_params.get(
+                self.settings.URL_FORMAT_OVERRIDE)
+            if format:
+                renderers = self.filter_renderers(renderers, format)
+            return renderers[0], renderers[0].media_type
@@ -0,0 +1,60 @@
+"""Поиск рецептов и ингредиентов с ранжированием."""
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+SEARCH_CONFIG = 'russian'
+
+
+def use_postgres_search():
+    """Включён ли полнотекстовый и триграммный поиск Postgres."""
+    return (settings.POSTGRES_SEARCH
+            and connection.vendor == 'postgresql')
+
+
+def simple_rank(field, value):
+    """Ранг совпадения для запасного поиска без расширений БД."""
+    return Case(
+        When(**{f'{field}__iexact': value}, then=Value(3)),
+        When(**{f'{field}__istartswith': value}, then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+def search_recipes(queryset, value):
+    """Рецепты, подходящие под запрос, от наиболее релевантных."""
+    if use_postgres_search():
+        vector = (
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        )
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=(SearchRank(vector, query)
+                         + TrigramSimilarity('name', value)),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).order_by('-search_rank', '-id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(
+        search_rank=simple_rank('name', value)
+    ).order_by('-search_rank', '-id')
+
+
+def search_ingredients(queryset, value):
+    """Ингредиенты, похожие на запрос, от наиболее похожих."""
+    if use_postgres_search():
+        return queryset.annotate(
+            search_rank=TrigramSimilarity('name', value)
+        ).filter(
+            Q(name__trigram_similar=value) | Q(name__icontains=value)
+        ).order_by('-search_rank', 'name')
+    return queryset.filter(name__icontains=value).annotate(
+        search_rank=simple_rank('name', value)
+    ).order_by('-search_rank', 'name')
@@ -1,21 +1,25 @@
+from django.conf import settings
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import IntegerField, SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.fields import (IntegerField, ListField,
+                                   SerializerMethodField)
 from rest_framework.serializers import (ModelSerializer, ReadOnlyField,
-                                        UniqueTogetherValidator)
+                                        Serializer)
 
+from api.images import ImageUploadField, ImageURLField, ThumbnailsField
+from api.relations import get_user_relations
+from api.utils import check_ids_exist, get_recipes_limit
 from foodgram import constants
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
-from users.models import Subscribe, User
+                            ShoppingCart, ShoppingCartTotal, Tag)
+from users.models import User
 
 
 class AvatarSerializer(UserSerializer):
     """Аватар."""
 
-    avatar = Base64ImageField(required=True)
+    avatar = ImageUploadField(required=True)
 
     class Meta:
         """Класс Meta."""
@@ -35,6 +39,8 @@ class UserReadSerializer(UserSerializer):
     """Чтение информации о пользователе и подписке."""
 
     is_subscribed = SerializerMethodField(read_only=True)
+    avatar = ImageURLField()
+    avatar_thumbnails = ThumbnailsField()
 
     class Meta:
         """Класс Meta."""
@@ -42,16 +48,14 @@ class UserReadSerializer(UserSerializer):
         model = User
         fields = ('email', 'id', 'username',
                   'first_name', 'last_name',
-                  'is_subscribed', 'avatar')
+                  'is_subscribed', 'avatar', 'avatar_thumbnails')
 
     def get_is_subscribed(self, author):
         """Проверка наличия подписки."""
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and Subscribe.objects.filter(user=request.user,
-                                         author=author).exists()
-        )
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return author.id in get_user_relations(
+            self.context.get('request')).following
 
 
 class UserCreateSerializers(UserCreateSerializer):
@@ -74,7 +78,7 @@ class SubscriptionsSerializer(UserReadSerializer):
     class Meta(UserReadSerializer.Meta):
         """Класс Meta."""
 
-        fields = ('email', 'id', 'avatar',
+        fields = ('email', 'id', 'avatar', 'avatar_thumbnails',
                   'username', 'first_name',
                   'last_name', 'is_subscribed',
                   'recipes', 'recipes_count')
@@ -83,45 +87,29 @@ class SubscriptionsSerializer(UserReadSerializer):
 
     def get_recipes_count(self, author):
         """Количество подписок на рецепт автора."""
+        if hasattr(author, 'recipes_count'):
+            return author.recipes_count
         return author.recipes.count()
 
     def get_recipes(self, author):
         """Получение списка рецептов автора."""
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit', None)
+        limit = get_recipes_limit(self.context.get('request'))
         recipes = author.recipes.all()
         if limit is not None:
-            recipes = recipes[:int(limit)]
+            recipes = recipes[:limit]
         serializer = RecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
 
-class SubscribeSerializer(ModelSerializer):
-    """Подписка на автора."""
+class BatchSerializer(Serializer):
+    """Список id для пакетной операции."""
 
-    class Meta:
-        """Класс Meta."""
+    ids = ListField(child=IntegerField(min_value=1), allow_empty=False,
+                    max_length=settings.BATCH_MAX_SIZE)
 
-        model = Subscribe
-        fields = ('user', 'author')
-        validators = [UniqueTogetherValidator(
-            queryset=Subscribe.objects.all(),
-            fields=('user', 'author'),
-            message='Вы уже подписаны на этого автора.')
-        ]
-
-    def validate(self, data):
-        """Валидация подписки на себя."""
-        if self.context['request'].user == data['author']:
-            raise ValidationError('Нельзя подписаться на самого себя.')
-        return data
-
-    def to_representation(self, instance):
-        """Метод представления данных."""
-        return SubscriptionsSerializer(
-            instance.author,
-            context={'request': self.context.get('request')}
-        ).data
+    def validate_ids(self, value):
+        """Удаление повторов с сохранением порядка."""
+        return list(dict.fromkeys(value))
 
 
 class IngredientSerializer(ModelSerializer):
@@ -147,13 +135,14 @@ class TagSerializer(ModelSerializer):
 class RecipeSerializer(ModelSerializer):
     """Список рецептов без ингредиентов."""
 
-    image = Base64ImageField()
+    image = ImageURLField()
+    thumbnails = ThumbnailsField()
 
     class Meta:
         """Класс Meta."""
 
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time')
         read_only_fields = ('name', 'image', 'cooking_time')
 
 
@@ -181,7 +170,8 @@ class RecipeReadSerializer(ModelSerializer):
     ingredients = SerializerMethodField()
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
-    image = Base64ImageField()
+    image = ImageURLField()
+    thumbnails = ThumbnailsField()
 
     class Meta:
         """Класс Meta."""
@@ -190,38 +180,43 @@ class RecipeReadSerializer(ModelSerializer):
         fields = ('id', 'tags',
                   'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image',
+                  'name', 'image', 'thumbnails',
                   'text', 'cooking_time')
 
     def get_ingredients(self, obj):
         """Получение списка ингредиентов."""
-        ingredients = IngredientRecipe.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(ingredients, many=True).data
+        return RecipeIngredientSerializer(obj.recipe.all(), many=True).data
 
     def get_is_favorited(self, obj):
         """Проверка добавления рецепта в избранное."""
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and Favorite.objects.filter(user=request.user,
-                                        recipe=obj).exists()
-        )
+        return obj.id in get_user_relations(
+            self.context.get('request')).favorites
 
     def get_is_in_shopping_cart(self, obj):
         """Проверка нахождения рецепта в списке покупок."""
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and ShoppingCart.objects.filter(user=request.user,
-                                            recipe=obj).exists()
-        )
+        return obj.id in get_user_relations(
+            self.context.get('request')).shopping_cart
+
+
+class ShoppingCartTotalSerializer(ModelSerializer):
+    """Итоговое количество ингредиента в списке покупок."""
+
+    id = ReadOnlyField(source='ingredient.id')
+    name = ReadOnlyField(source='ingredient.name')
+    measurement_unit = ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        """Класс Meta."""
+
+        model = ShoppingCartTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
 class RecipeIngredientCreateSerializer(ModelSerializer):
     """Ингредиент с количеством для создания рецепта."""
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),
-                                write_only=True)
+    id = IntegerField(write_only=True)
     amount = IntegerField(max_value=constants.AMOUNT_MAХ_VALUE,
                           min_value=constants.AMOUNT_MIN_VALUE)
 
@@ -236,9 +231,9 @@ class RecipeCreateSerializer(ModelSerializer):
     """Создание, изменение или удаление рецепта."""
 
     author = UserReadSerializer(read_only=True)
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
+    tags = ListField(child=IntegerField())
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = ImageUploadField()
     cooking_time = IntegerField(max_value=constants.COOKING_TIME_MAX_VALUE,
                                 min_value=constants.COOKING_TIME_MIN_VALUE)
 
@@ -275,6 +270,7 @@ class RecipeCreateSerializer(ModelSerializer):
             if ingredient_id in ingredients:
                 raise ValidationError('Ингредиенты не могут повторяться!')
             ingredients.add(ingredient_id)
+        check_ids_exist(Ingredient.objects.all(), ingredients)
         return value
 
     def validate_tags(self, value):
@@ -283,42 +279,75 @@ class RecipeCreateSerializer(ModelSerializer):
             raise ValidationError('Нужно выбрать хотя бы один тег!')
         if len(value) != len(set(value)):
             raise ValidationError('Теги должны быть уникальными!')
+        check_ids_exist(Tag.objects.all(), value)
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         """Метод создания рецепта."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.create_ingredients_amounts(ingredients, recipe)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in self.get_amounts(ingredients).items()
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         """Метод редактирования рецепта."""
         if 'tags' in validated_data:
             recipe.tags.set(validated_data.pop('tags'))
 
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            recipe.ingredients.clear()
-            self.create_ingredients_amounts(ingredients, recipe)
+            self.update_ingredients_amounts(
+                recipe, self.get_amounts(validated_data.pop('ingredients')))
 
-        return super().update(recipe, validated_data)
+        for field, value in validated_data.items():
+            setattr(recipe, field, value)
+        recipe.save(update_fields=list(validated_data))
+        return recipe
 
     @staticmethod
-    def create_ingredients_amounts(ingredients, recipe):
-        """Добавление ингредиентов с количеством."""
-        IngredientRecipe.objects.bulk_create([
-            IngredientRecipe(ingredient=i['id'],
-                             recipe=recipe,
-                             amount=i['amount'])
-            for i in ingredients
-        ])
+    def get_amounts(ingredients):
+        """Количество по id ингредиента."""
+        return {item['id']: item['amount'] for item in ingredients}
+
+    @staticmethod
+    def update_ingredients_amounts(recipe, amounts):
+        """Изменение только добавленных, удалённых и изменённых строк."""
+        current = {item.ingredient_id: item for item in recipe.recipe.all()}
+        removed = current.keys() - amounts.keys()
+        changed = [item for ingredient_id, item in current.items()
+                   if ingredient_id in amounts
+                   and item.amount != amounts[ingredient_id]]
+        added = amounts.keys() - current.keys()
+        if not (removed or changed or added):
+            return
+
+        # Удаляемые строки вычитаются из итогов сигналом post_delete,
+        # остальные - здесь, до пакетного обновления без сигналов.
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        ShoppingCartTotal.objects.remove_recipe(recipe.id)
+        for item in changed:
+            item.amount = amounts[item.ingredient_id]
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amounts[ingredient_id])
+            for ingredient_id in added
+        )
+        ShoppingCartTotal.objects.add_recipe(recipe.id)
 
     def to_representation(self, recipe):
         """Метод представления данных."""
         context = {'request': self.context.get('request')}
+        recipe = Recipe.objects.with_related().get(pk=recipe.pk)
         return RecipeReadSerializer(recipe, context=context).data
 
 
@@ -0,0 +1,79 @@
+"""Короткие ссылки на рецепты: один код на рецепт и переходы из кэша."""
+import string
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import cache
+from shortlink.models import ShortLink
+from shortlink.settings import HOST_ADDRESS, SHORTLINK_URL_BASE
+
+ALPHABET = string.digits + string.ascii_letters
+
+
+def encode_id(number):
+    """Запись id в base62: код короче случайных кодов пакета."""
+    code = ''
+    while True:
+        number, rest = divmod(number, len(ALPHABET))
+        code = ALPHABET[rest] + code
+        if not number:
+            return code
+
+
+def path_key(short_path):
+    """Ключ кэша адреса перехода по коду."""
+    return f'shortlink:path:{short_path}'
+
+
+def url_key(full_url):
+    """Ключ кэша кода по полному адресу."""
+    return f'shortlink:url:{sha1(full_url.encode()).hexdigest()}'
+
+
+def cache_link(short_path, full_url):
+    """Запись соответствия кода и адреса в обе стороны."""
+    timeout = settings.SHORT_LINK_CACHE_TIMEOUT
+    cache.set_many({path_key(short_path): full_url,
+                    url_key(full_url): short_path}, timeout)
+
+
+def invalidate_link(short_path, full_url):
+    """Сброс кэша при изменении или удалении ссылки."""
+    cache.delete_many([path_key(short_path), url_key(full_url)])
+
+
+def get_short_path(recipe_id, full_url):
+    """Код ссылки на рецепт.
+
+    Используется уже выданный код для этого адреса, иначе код
+    из id рецепта, так что повторные запросы не создают строк.
+    """
+    short_path = cache.get(url_key(full_url))
+    if short_path is not None:
+        return short_path
+    link = ShortLink.objects.filter(
+        full_url=full_url).order_by('id').first()
+    if link is None:
+        link, _ = ShortLink.objects.get_or_create(
+            short_path=encode_id(recipe_id),
+            defaults={'full_url': full_url})
+    cache_link(link.short_path, link.full_url)
+    return link.short_path
+
+
+def get_short_url(recipe_id, full_url):
+    """Короткая ссылка на рецепт."""
+    return (f'{HOST_ADDRESS}/{SHORTLINK_URL_BASE}'
+            f'{get_short_path(recipe_id, full_url)}')
+
+
+def resolve_short_path(short_path):
+    """Адрес перехода по коду (None, если кода нет)."""
+    full_url = cache.get(path_key(short_path))
+    if full_url is None:
+        full_url = ShortLink.objects.filter(
+            short_path=short_path
+        ).order_by('id').values_list('full_url', flat=True).first()
+        if full_url is not None:
+            cache_link(short_path, full_url)
+    return full_url
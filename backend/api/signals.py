@@ -0,0 +1,182 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from shortlink.models import ShortLink
+
+from api.authentication import invalidate_tokens
+from api.cache import bump_version, invalidate_anonymous_responses
+from api.images import schedule_thumbnails, thumbnails_outdated
+from api.ingredient_index import ingredient_index
+from api.relations import invalidate_user_relations
+from api.shortlinks import invalidate_link
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag)
+from users.models import Subscribe, User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """Сброс индекса поиска при изменении ингредиентов."""
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_reference_cache(sender, **kwargs):
+    """Сброс кэша справочников при изменении тегов и ингредиентов."""
+    bump_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=User)
+def invalidate_counts(sender, created=True, **kwargs):
+    """Сброс кэша счётчиков при создании и удалении объектов."""
+    if created:
+        bump_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_counts(**kwargs):
+    """Сброс счётчиков рецептов при изменении связей для фильтров."""
+    bump_version(Recipe)
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_subscription_counts(**kwargs):
+    """Сброс счётчиков пользователей при изменении подписок."""
+    bump_version(User)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_relations(instance, **kwargs):
+    """Сброс кэша связей пользователя при их изменении."""
+    invalidate_user_relations(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_responses(**kwargs):
+    """Сброс ответов анонимным пользователям при изменении рецептов."""
+    invalidate_anonymous_responses()
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user_responses(update_fields=None, **kwargs):
+    """Сброс ответов анонимным пользователям при изменении профиля.
+
+    Обновление last_login при входе на ответы не влияет.
+    """
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        invalidate_anonymous_responses()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_cart_totals(instance, created, **kwargs):
+    """Прибавление ингредиентов рецепта к итогам списка покупок."""
+    if created:
+        ShoppingCartTotal.objects.add_recipe(instance.recipe_id,
+                                             instance.user_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_cart_totals(instance, **kwargs):
+    """Вычитание ингредиентов рецепта из итогов списка покупок."""
+    ShoppingCartTotal.objects.remove_recipe(instance.recipe_id,
+                                            instance.user_id)
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def remove_old_item_from_cart_totals(instance, raw=False, **kwargs):
+    """Вычитание прежней строки рецепта из итогов списков покупок."""
+    if raw or instance.pk is None:
+        return
+    old = IngredientRecipe.objects.filter(pk=instance.pk).values(
+        'recipe_id', 'ingredient_id', 'amount').first()
+    if old is not None:
+        ShoppingCartTotal.objects.remove_item(**old)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def add_item_to_cart_totals(instance, raw=False, **kwargs):
+    """Прибавление сохранённой строки рецепта к итогам списков покупок."""
+    if not raw:
+        ShoppingCartTotal.objects.add_item(
+            instance.recipe_id, instance.ingredient_id, instance.amount)
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def remove_item_from_cart_totals(instance, **kwargs):
+    """Вычитание удалённой строки рецепта из итогов списков покупок."""
+    ShoppingCartTotal.objects.remove_item(
+        instance.recipe_id, instance.ingredient_id, instance.amount)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def process_uploaded_image(instance, **kwargs):
+    """Построение миниатюр нового изображения после коммита."""
+    if thumbnails_outdated(instance):
+        schedule_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    """Сброс кэша токена при выходе из системы."""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, **kwargs):
+    """Сброс кэша токенов при смене пароля, деактивации и изменении
+    профиля пользователя."""
+    invalidate_tokens(*Token.objects.filter(
+        user=instance).values_list('key', flat=True))
+
+
+@receiver((post_save, post_delete), sender=ShortLink)
+def invalidate_short_link(instance, **kwargs):
+    """Сброс кэша короткой ссылки при её изменении или удалении."""
+    invalidate_link(instance.short_path, instance.full_url)
+
+
+def user_recipe_changed(model, user_id, recipe_ids, added):
+    """Сброс кэшей после INSERT/DELETE избранного или покупок в обход ORM.
+
+    Кэши сбрасываются после коммита, чтобы параллельный запрос не сохранил
+    в них данные до изменения; итоги корзины пишутся в той же транзакции.
+    """
+    transaction.on_commit(lambda: invalidate_user_recipes(user_id))
+    if model is not ShoppingCart:
+        return
+    if len(recipe_ids) > 1:
+        ShoppingCartTotal.objects.rebuild(user_id)
+    elif added:
+        ShoppingCartTotal.objects.add_recipe(*recipe_ids, user_id)
+    else:
+        ShoppingCartTotal.objects.remove_recipe(*recipe_ids, user_id)
+
+
+def subscription_changed(user_id):
+    """Сброс кэшей после INSERT/DELETE подписки в обход ORM."""
+    transaction.on_commit(lambda: invalidate_subscriptions(user_id))
+
+
+def invalidate_user_recipes(user_id):
+    """Сброс счётчиков рецептов и кэша связей пользователя."""
+    bump_version(Recipe)
+    invalidate_user_relations(user_id)
+
+
+def invalidate_subscriptions(user_id):
+    """Сброс счётчиков пользователей и кэша связей пользователя."""
+    bump_version(User)
+    invalidate_user_relations(user_id)
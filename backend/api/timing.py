@@ -0,0 +1,232 @@
+"""Замеры времени запроса для заголовка Server-Timing.
+
+Middleware для выборки запросов (SERVER_TIMING_SAMPLE_RATE) считает
+число и время SQL-запросов, время вьюхи и сериализаторов DRF без SQL,
+время рендеринга ответа DRF и общее время. Результат отдаётся
+в заголовке Server-Timing и пишется строкой в лог. При нулевой доле
+выборки middleware отключается при запуске.
+"""
+import asyncio
+import logging
+import random
+from contextvars import ContextVar
+from functools import lru_cache
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+_timing = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Отметки времени одного запроса, секунды."""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.view_start = self.view_end = None
+        self.render_start = self.render_end = None
+        self.db_at_view_start = self.db_at_view_end = 0.0
+        self.db_at_render_start = self.db_at_render_end = 0.0
+
+    def mark_view_end(self):
+        """Конец вьюхи (начало рендеринга или возврат ответа)."""
+        if self.view_start is not None and self.view_end is None:
+            self.view_end = perf_counter()
+            self.db_at_view_end = self.db
+
+    def metrics(self):
+        """Метрики в миллисекундах."""
+        metrics = {
+            'db': self.db,
+            'view': 0.0,
+            'ser': self.serializer,
+            'render': 0.0,
+            'total': perf_counter() - self.start,
+        }
+        if self.view_end is not None:
+            metrics['view'] = (self.view_end - self.view_start
+                               - (self.db_at_view_end
+                                  - self.db_at_view_start)
+                               - self.serializer)
+        if self.render_end is not None:
+            metrics['render'] = (self.render_end - self.render_start
+                                 - (self.db_at_render_end
+                                    - self.db_at_render_start))
+        return {name: round(value * 1000, 2)
+                for name, value in metrics.items()}
+
+
+def track_query(execute, sql, params, many, context):
+    """Обёртка execute: время и число запросов текущего запроса."""
+    timing = _timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += perf_counter() - start
+        timing.queries += 1
+
+
+def install_query_tracker(connection, **kwargs):
+    """Подключение обёртки к соединению (один раз)."""
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+class TimedSerializerData:
+    """Время обращения к data сериализатора без SQL."""
+
+    @property
+    def data(self):
+        timing = _timing.get()
+        if timing is None:
+            return super().data
+        start, db = perf_counter(), timing.db
+        try:
+            return super().data
+        finally:
+            timing.serializer += perf_counter() - start - (timing.db - db)
+
+
+@lru_cache(maxsize=None)
+def timed_class(serializer_class):
+    """Подкласс сериализатора с замером времени data."""
+    return type(serializer_class.__name__,
+                (TimedSerializerData, serializer_class), {})
+
+
+def timed(serializer):
+    """Сериализатор, время которого попадает в метрику ser.
+
+    Вне выборки Server-Timing сериализатор не меняется.
+    """
+    if _timing.get() is not None:
+        serializer.__class__ = timed_class(type(serializer))
+    return serializer
+
+
+class SerializerTimingMixin:
+    """Замер времени сериализаторов вьюсета для метрики ser."""
+
+    def get_serializer(self, *args, **kwargs):
+        return timed(super().get_serializer(*args, **kwargs))
+
+
+class ServerTimingMiddleware:
+    """Заголовок Server-Timing и строка лога для доли запросов.
+
+    Под ASGI работает асинхронно, чтобы не занимать общий поток
+    синхронного кода на всё время запроса.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: экземпляр считается корутиной,
+            # а хуки вызываются без перехода в общий поток.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.async_process_view
+            self.process_template_response = (
+                self.async_process_template_response)
+        # Соединения потоков создаются позже, уже открытые - здесь.
+        connection_created.connect(install_query_tracker,
+                                   dispatch_uid='server_timing')
+        for connection in connections.all():
+            install_query_tracker(connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timing = RequestTiming()
+        token = _timing.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timing.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        timing = RequestTiming()
+        token = _timing.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timing.reset(token)
+        return self.finish(request, response, timing)
+
+    @staticmethod
+    def sampled():
+        """Попадает ли запрос в выборку."""
+        return random.random() < settings.SERVER_TIMING_SAMPLE_RATE
+
+    @staticmethod
+    def finish(request, response, timing):
+        """Заголовок и строка лога с замерами."""
+        timing.mark_view_end()
+        metrics = timing.metrics()
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics["db"]};desc="queries={timing.queries}"',
+            f'view;dur={metrics["view"]}',
+            f'ser;dur={metrics["ser"]};desc="serializers"',
+            f'render;dur={metrics["render"]}',
+            f'total;dur={metrics["total"]}',
+        ))
+        logger.info(
+            '%s %s %s total=%s db=%s queries=%s view=%s ser=%s render=%s',
+            request.method, request.path, response.status_code,
+            metrics['total'], metrics['db'], timing.queries,
+            metrics['view'], metrics['ser'], metrics['render'],
+            extra={'timing': {**metrics, 'queries': timing.queries,
+                              'method': request.method,
+                              'path': request.path,
+                              'status': response.status_code}},
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _timing.get()
+        if timing is not None:
+            timing.view_start = perf_counter()
+            timing.db_at_view_start = timing.db
+
+    def process_template_response(self, request, response):
+        """Ответы DRF рендерятся после этого хука."""
+        timing = _timing.get()
+        if timing is None:
+            return response
+        timing.mark_view_end()
+        timing.render_start = perf_counter()
+        timing.db_at_render_start = timing.db
+
+        def render_finished(response):
+            timing.render_end = perf_counter()
+            timing.db_at_render_end = timing.db
+
+        response.add_post_render_callback(render_finished)
+        return response
+
+    async def async_process_view(self, *args):
+        return ServerTimingMiddleware.process_view(self, *args)
+
+    async def async_process_template_response(self, request, response):
+        return ServerTimingMiddleware.process_template_response(
+            self, request, response)
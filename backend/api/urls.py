@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from api import views
+from api.async_views import async_read_urls
 
 app_name = 'api'
 
@@ -15,10 +16,16 @@ router.register(
     views.IngredientViewSet,
     basename='ingredients'
 )
-
+# Маршруты чтения, которые в режиме ASGI выполняются асинхронно
+ASYNC_READ_ROUTES = {
+    'recipes-list', 'recipes-detail',
+    'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail',
+}
 
 urls = [
-    path('', include(router.urls)),
+    path('', include(async_read_urls(router.urls, ASYNC_READ_ROUTES))),
+    path('db-stats/', views.db_stats, name='db-stats'),
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,24 +1,47 @@
-from datetime import datetime
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
-from django.shortcuts import HttpResponse
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit (None, если не передан)."""
+    limit = request.query_params.get('recipes_limit')
+    if limit is None:
+        return None
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValidationError(
+            {'recipes_limit': 'Должно быть целым положительным числом.'})
+    return int(limit)
 
-def shopping_cart_txt(self, request, ingredients):
-    """Формирование файла shopping-list.txt - список покупок."""
-    user = self.request.user
-    today = datetime.today()
-    shopping_list = (
-        f'Список покупок для: {user.get_full_name()}\n\n'
-        f'Дата: {today:%Y-%m-%d}\n\n'
-    )
-    shopping_list += '\n'.join([
-        f'- {ingredient["ingredient__name"]} '
-        f'({ingredient["ingredient__measurement_unit"]})'
-        f' - {ingredient["amount"]}'
-        for ingredient in ingredients
-    ])
-    shopping_list += f'\n\nсформировано сервисом "Foodgram" ({today:%Y})'
-    filename = f'{user.username}_shopping_list.txt'
-    response = HttpResponse(shopping_list, content_type='text/plain')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    return response
+
+def check_ids_exist(queryset, ids):
+    """Проверка существования объектов по списку id одним запросом."""
+    found = set(queryset.filter(id__in=ids).values_list('id', flat=True))
+    for pk in ids:
+        if pk not in found:
+            raise ValidationError(
+                f'Недопустимый первичный ключ "{pk}" - объект не существует.')
+
+
+def batch_results(queryset, ids, changed, success_status, error,
+                  rejected=None):
+    """Результат пакетной операции по каждому id.
+
+    Для id, которые не попали в changed, одним запросом проверяется,
+    существует ли объект: 404, если нет, иначе 400 с текстом error.
+    rejected - отклонённые до записи id с текстом ошибки.
+    """
+    rejected = rejected or {}
+    missing = set(ids) - set(changed) - set(rejected)
+    existing = set(queryset.filter(id__in=missing).values_list(
+        'id', flat=True)) if missing else set()
+    results = []
+    for pk in ids:
+        if pk in changed:
+            results.append({'id': pk, 'status': success_status})
+        elif pk in rejected or pk in existing:
+            results.append({'id': pk, 'status': status.HTTP_400_BAD_REQUEST,
+                            'errors': rejected.get(pk, error)})
+        else:
+            results.append({'id': pk, 'status': status.HTTP_404_NOT_FOUND,
+                            'errors': 'Не найдено.'})
+    return results
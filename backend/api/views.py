@@ -1,35 +1,50 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import (BooleanField, Count, F, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.db.models.functions import Greatest
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
-from rest_framework.decorators import action
-from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
                                         IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-from shortlink.models import ShortLink
 
+from api.cache import AnonymousCacheMixin, ReferenceCacheMixin
+from api.exports import EXPORTERS
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomPaginator
+from api.images import delete_thumbnails
+from api.ingredient_index import ingredient_index
+from api.pagination import CachedCountPaginator, RecipePaginator
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (AvatarSerializer, IngredientSerializer,
-                             RecipeCreateSerializer, RecipeReadSerializer,
-                             RecipeSerializer, SubscribeSerializer,
+from api.renderers import SHOPPING_LIST_RENDERERS, ShoppingListNegotiation
+from api.serializers import (AvatarSerializer, BatchSerializer,
+                             IngredientSerializer, RecipeCreateSerializer,
+                             RecipeReadSerializer, RecipeSerializer,
+                             ShoppingCartTotalSerializer,
                              SubscriptionsSerializer, TagSerializer,
                              UserReadSerializer)
-from api.utils import shopping_cart_txt
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
-from users.models import User
+from api.shortlinks import get_short_url, resolve_short_path
+from api.signals import subscription_changed, user_recipe_changed
+from api.timing import SerializerTimingMixin, timed
+from api.utils import batch_results, get_recipes_limit
+from foodgram.db.pool import connection_stats
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Subscribe, User
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializerTimingMixin, AnonymousCacheMixin,
+                        UserViewSet):
     """Вьюсет пользователя."""
     queryset = User.objects.all()
+    anonymous_cache_actions = ('retrieve',)
+    lookup_value_regex = r'\d+'
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = CustomPaginator
+    pagination_class = CachedCountPaginator
     serializer_class = UserReadSerializer
 
     def get_permissions(self):
@@ -45,42 +60,97 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         """Подписка на автора."""
-        author = get_object_or_404(User, id=id)
-        serializer = SubscribeSerializer(
-            data={'user': request.user.id, 'author': author.id},
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        get_recipes_limit(request)
+        user = request.user
+        if int(id) == user.id:
+            return Response({'errors': 'Нельзя подписаться на самого себя.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            if not Subscribe.objects.add(user.id, id):
+                get_object_or_404(User, id=id)
+                return Response(
+                    {'errors': 'Вы уже подписаны на этого автора.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            subscription_changed(user.id)
+        serializer = timed(SubscriptionsSerializer(
+            User.objects.get(id=id), context={'request': request}))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id=None):
         """Удаление подписки."""
-        author = get_object_or_404(User, id=id)
         user = self.request.user
-        subscribe = user.subscriber.filter(author=author)
-        if subscribe.exists():
-            subscribe.delete()
-            return Response({'detail': 'Вы успешно отписались!'},
-                            status=status.HTTP_204_NO_CONTENT)
+        with transaction.atomic():
+            if Subscribe.objects.remove(user.id, id):
+                subscription_changed(user.id)
+                return Response({'detail': 'Вы успешно отписались!'},
+                                status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, id=id)
         return Response(
             {'errors': 'Вы не подписаны на этого автора!'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='subscribe/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def subscribe_batch(self, request):
+        """Пакетная подписка на авторов и отписка от них."""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        if request.method == 'POST':
+            with transaction.atomic():
+                changed = Subscribe.objects.add_many(
+                    user.id, [pk for pk in ids if pk != user.id])
+                if changed:
+                    subscription_changed(user.id)
+            results = batch_results(
+                User.objects.all(), ids, changed, status.HTTP_201_CREATED,
+                'Вы уже подписаны на этого автора.',
+                rejected={user.id: 'Нельзя подписаться на самого себя.'})
+        else:
+            with transaction.atomic():
+                changed = Subscribe.objects.remove_many(user.id, ids)
+                if changed:
+                    subscription_changed(user.id)
+            results = batch_results(
+                User.objects.all(), ids, changed,
+                status.HTTP_204_NO_CONTENT,
+                'Вы не подписаны на этого автора!')
+        return Response({'results': results})
+
     @action(
         detail=False,
         methods=('get',),
         permission_classes=[IsAuthenticated],
-        pagination_class=CustomPaginator
+        pagination_class=CachedCountPaginator
     )
     def subscriptions(self, request):
         """Список авторов, на которых подписан пользователь."""
-        queryset = User.objects.filter(subscribing__user=self.request.user)
+        recipes = Recipe.objects.all()
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            ))
+        queryset = User.objects.filter(
+            subscribing__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipes', distinct=True),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('username')
         limit = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerializer(limit, many=True,
-                                             context={'request': request})
+        serializer = timed(SubscriptionsSerializer(
+            limit, many=True, context={'request': request}))
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -101,8 +171,10 @@ class CustomUserViewSet(UserViewSet):
         """Удаление аватара пользователя."""
         user = request.user
         if user.avatar:
+            delete_thumbnails(User, user.avatar.storage,
+                              user.avatar_thumbnails)
+            user.avatar_thumbnails = {}
             user.avatar.delete()
-            user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'errors': 'Аватар отсутствует.'},
@@ -110,7 +182,8 @@ class CustomUserViewSet(UserViewSet):
         )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(SerializerTimingMixin, ReferenceCacheMixin,
+                        ReadOnlyModelViewSet):
     """Вьюсет ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -119,22 +192,52 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     search_fields = ('^name', )
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """Список или поиск по названию, оба с кэшем и ETag."""
+        if not request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        """Поиск по названию через индекс в памяти."""
+        serializer = self.get_serializer(
+            ingredient_index.search(request.query_params['name']), many=True)
+        return Response(serializer.data)
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(SerializerTimingMixin, ReferenceCacheMixin,
+                 ReadOnlyModelViewSet):
     """Вьюсет тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(SerializerTimingMixin, AnonymousCacheMixin,
+                    ModelViewSet):
     """Вьюсет рецептов."""
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = [IsAuthorOrReadOnly & IsAuthenticatedOrReadOnly]
-    pagination_class = CustomPaginator
+    pagination_class = RecipePaginator
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def anonymous_cacheable(self, request):
+        """Популярные рецепты не кэшируются.
+
+        Счётчики избранного и покупок обновляются в обход сигналов
+        моделей, и порядок устаревал бы до истечения кэша.
+        """
+        return (super().anonymous_cacheable(request)
+                and 'popular' not in request.query_params.getlist('ordering'))
+
+    def get_queryset(self):
+        """Рецепты с подгруженными связями и флагами пользователя."""
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.with_related()
+        return super().get_queryset()
+
     def get_serializer_class(self):
         """Выбор сериализатора."""
         if self.request.method in SAFE_METHODS:
@@ -147,7 +250,7 @@ class RecipeViewSet(ModelViewSet):
 
     def perform_update(self, serializer):
         """Изменение рецепта."""
-        serializer.save(partial=True)
+        serializer.save()
 
     @action(
         detail=True,
@@ -157,15 +260,14 @@ class RecipeViewSet(ModelViewSet):
     )
     def short_link(self, request, pk=None):
         """Получение короткой ссылки на рецепт."""
-        recipe = self.get_object()
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
         short_link = self.get_short_link(request, recipe)
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
     def get_short_link(self, request, recipe):
-        """Создание короткой ссылки для рецепта."""
+        """Короткая ссылка для рецепта (одна на рецепт)."""
         full_url = request.build_absolute_uri(f'/recipes/{recipe.id}/')
-        short_link = ShortLink.objects.create(full_url=full_url)
-        return short_link.short_url
+        return get_short_url(recipe.id, full_url)
 
     @action(
         detail=True,
@@ -191,41 +293,137 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(model, request.user, pk)
         return self.delete_from(model, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        """Пакетное добавление и удаление рецептов из избранного."""
+        return self.handle_batch(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        """Пакетное добавление и удаление рецептов из покупок."""
+        return self.handle_batch(ShoppingCart, request)
+
+    def handle_batch(self, model, request):
+        """Добавление или удаление нескольких рецептов одной командой."""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        adding = request.method == 'POST'
+        with transaction.atomic():
+            if adding:
+                changed = model.objects.add_many(user.id, ids)
+            else:
+                changed = model.objects.remove_many(user.id, ids)
+            if changed:
+                self.update_counter(model, changed, 1 if adding else -1)
+                user_recipe_changed(model, user.id, changed, added=adding)
+        if adding:
+            results = batch_results(
+                Recipe.objects.all(), ids, changed,
+                status.HTTP_201_CREATED, 'Рецепт уже добавлен!')
+        else:
+            results = batch_results(
+                Recipe.objects.all(), ids, changed,
+                status.HTTP_204_NO_CONTENT, 'Этот рецепт не был добавлен!')
+        return Response({'results': results})
+
+    @staticmethod
+    def update_counter(model, ids, delta):
+        """Изменение счётчика рецептов на стороне БД.
+
+        Счётчик не уходит ниже нуля, даже если разошёлся со связями
+        после записи в обход API (админка, ORM).
+        """
+        Recipe.objects.filter(id__in=ids).update(
+            **{model.counter_field: Greatest(
+                F(model.counter_field) + delta, 0)})
+
+    @transaction.atomic
     def add_to(self, model, user, pk):
         """Добавление рецепта."""
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        if not model.objects.add(user.id, pk):
+            get_object_or_404(Recipe, id=pk)
             return Response({'errors': 'Рецепт уже добавлен!'},
                             status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeSerializer(recipe)
+        self.update_counter(model, [pk], 1)
+        user_recipe_changed(model, user.id, [pk], added=True)
+        serializer = timed(RecipeSerializer(Recipe.objects.get(id=pk)))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_from(self, model, user, pk):
         """Удаление рецепта."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        obj = model.objects.filter(user=user, recipe=recipe)
-        if obj.exists():
-            obj.delete()
+        if model.objects.remove(user.id, pk):
+            self.update_counter(model, [pk], -1)
+            user_recipe_changed(model, user.id, [pk], added=False)
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=pk)
         return Response({'errors': 'Этот рецепт не был добавлен!'},
                         status=status.HTTP_400_BAD_REQUEST)
 
     @action(
         detail=False,
         methods=('get',),
+        url_path='shopping_cart',
+        url_name='shopping-cart-summary',
         permission_classes=(IsAuthenticated,)
     )
+    def shopping_cart_summary(self, request):
+        """Итоги списка покупок по ингредиентам."""
+        totals = request.user.cart_totals.select_related(
+            'ingredient').order_by('ingredient__name')
+        serializer = timed(ShoppingCartTotalSerializer(totals, many=True))
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+        content_negotiation_class=ShoppingListNegotiation
+    )
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок."""
+        """Скачивание списка покупок (?format=txt|csv|pdf)."""
         user = request.user
         if not user.shopping_recipe.filter(user=user).exists():
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_recipe__user=user
-        ).values(
+        ingredients = user.cart_totals.values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        return shopping_cart_txt(self, request, ingredients)
+            'ingredient__measurement_unit',
+            'amount',
+        ).order_by('ingredient__name')
+        exporter = EXPORTERS[request.accepted_renderer.format](
+            user, ingredients)
+        exporter.prepare()
+        response = StreamingHttpResponse(exporter.stream(),
+                                         content_type=exporter.content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename={exporter.filename}')
+        return response
+
+
+def short_link_redirect(request, path):
+    """Переход по короткой ссылке без запроса к БД при попадании в кэш."""
+    full_url = resolve_short_path(path)
+    if full_url is None:
+        raise Http404
+    return HttpResponseRedirect(full_url)
+
+
+@api_view(('GET',))
+@permission_classes((IsAdminUser,))
+def db_stats(request):
+    """Счётчики соединений с БД процесса, обслужившего запрос."""
+    return Response(connection_stats())
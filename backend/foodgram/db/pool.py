@@ -0,0 +1,82 @@
+"""Постоянные соединения с БД с проверкой перед повторным использованием.
+
+Django 3.2 держит по соединению на поток и закрывает его по истечении
+CONN_MAX_AGE, но не проверяет его перед первым запросом. Здесь
+соединение, пережившее конец запроса, проверяется при первом
+обращении в следующем запросе, а сверх DB_POOL_SIZE соединений
+на процесс постоянными не остаются. Счётчики подключений и повторных
+использований ведутся на процесс.
+"""
+import os
+import threading
+from collections import Counter
+from weakref import WeakSet
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_counters = Counter()
+_wrappers = WeakSet()
+
+
+def record(event):
+    """Увеличение счётчика события."""
+    with _lock:
+        _counters[event] += 1
+
+
+def open_connections():
+    """Число открытых соединений процесса.
+
+    Обёртки соединений живут в потоках и исчезают вместе с ними,
+    поэтому они хранятся по слабым ссылкам.
+    """
+    with _lock:
+        return sum(wrapper.connection is not None for wrapper in _wrappers)
+
+
+def connection_stats():
+    """Счётчики соединений текущего процесса."""
+    with _lock:
+        stats = {'connects': 0, 'reuses': 0, 'health_check_failures': 0,
+                 'overflow_closes': 0, **_counters}
+    stats['open'] = open_connections()
+    stats['pid'] = os.getpid()
+    return stats
+
+
+class PooledConnectionMixin:
+    """Примесь к DatabaseWrapper бэкенда."""
+
+    reuse_pending = False
+
+    def connect(self):
+        super().connect()
+        self.reuse_pending = False
+        with _lock:
+            _wrappers.add(self)
+        record('connects')
+
+    def close_if_unusable_or_obsolete(self):
+        """Вызывается в начале и в конце запроса."""
+        # get_autocommit() в родительском методе не должен считаться
+        # первым обращением запроса
+        self.reuse_pending = False
+        super().close_if_unusable_or_obsolete()
+        if self.connection is None or self.in_atomic_block:
+            return
+        if open_connections() > settings.DB_POOL_SIZE:
+            record('overflow_closes')
+            self.close()
+            return
+        self.reuse_pending = True
+
+    def ensure_connection(self):
+        if self.reuse_pending and self.connection is not None:
+            self.reuse_pending = False
+            if settings.DB_HEALTH_CHECKS and not self.is_usable():
+                record('health_check_failures')
+                self.close()
+            else:
+                record('reuses')
+        super().ensure_connection()
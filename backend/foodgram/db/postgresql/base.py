@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from foodgram.db.pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянных соединений."""
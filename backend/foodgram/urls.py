@@ -1,15 +1,20 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+from shortlink.settings import SHORTLINK_URL_BASE
 
+from api.async_views import async_read_urls
 from api.urls import urls as api_urls
+from api.views import short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(api_urls)),
-    path(r'', include('shortlink.urls')),
+    re_path(rf'^{SHORTLINK_URL_BASE}(?P<path>[a-zA-Z0-9 _-]+)$',
+            short_link_redirect, name='map_link'),
 ]
+urlpatterns = async_read_urls(urlpatterns, {'map_link'})
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,
@@ -32,15 +32,12 @@ class IngredientRecipeInline(admin.StackedInline):
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientRecipeInline,)
     list_display = ('name', 'author', 'image', 'cooking_time', 'text',
-                    'in_favorites',)
+                    'favorites_count', 'in_carts_count',)
     list_filter = ('author', 'name', 'tags',)
-    readonly_fields = ('in_favorites',)
+    readonly_fields = ('favorites_count', 'in_carts_count',)
+    list_select_related = ('author',)
     empty_value_display = '-пусто-'
 
-    @admin.display(description='В избранном')
-    def in_favorites(self, obj):
-        return obj.favorite_recipe.count()
-
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
@@ -0,0 +1,93 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import ANONYMOUS_RESPONSES, bump_version
+from api.query_plans import (ENDPOINTS, ROWS, capture_selects,
+                             client_environment, explain, find_problems)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+class Rollback(Exception):
+    """Откат сгенерированных данных после аудита."""
+
+
+class Command(BaseCommand):
+    """Аудит планов SQL-запросов эндпоинтов API."""
+
+    help = ('Прогон эндпоинтов, EXPLAIN (ANALYZE, BUFFERS) каждого SELECT '
+            'и поиск последовательных сканирований и сортировок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=ROWS,
+                            help='Порог строк для Seq Scan и Sort.')
+        parser.add_argument('--existing-data', action='store_true',
+                            help='Не генерировать данные, проверить '
+                                 'текущую БД.')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Выводить план каждого запроса.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN (ANALYZE, BUFFERS) доступен '
+                               'только для PostgreSQL.')
+        try:
+            with client_environment(), transaction.atomic():
+                if not options['existing_data']:
+                    call_command('generate_fake_data',
+                                 users=options['users'],
+                                 recipes=options['recipes'],
+                                 stdout=self.stdout)
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                for model in (ANONYMOUS_RESPONSES, Ingredient, Tag):
+                    bump_version(model)
+                problems = self.audit(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            bump_version(ANONYMOUS_RESPONSES)
+        if problems:
+            raise CommandError(f'Найдено проблемных узлов: {problems}.')
+        self.stdout.write(self.style.SUCCESS('Проблемных планов нет.'))
+
+    def audit(self, options):
+        """Прогон эндпоинтов и разбор планов их запросов."""
+        user = User.objects.order_by('-id').first()
+        recipe = Recipe.objects.order_by('-id').first()
+        if user is None or recipe is None:
+            raise CommandError('В базе нет пользователей или рецептов.')
+        token, _ = Token.objects.get_or_create(user=user)
+        auth_client = APIClient()
+        auth_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        anon_client = APIClient()
+        problems = 0
+        for name, url, auth in ENDPOINTS:
+            client = auth_client if auth else anon_client
+            url = url.format(recipe=recipe.id, author=recipe.author_id)
+            response, count, selects = capture_selects(client, url)
+            if response.status_code >= 400:
+                raise CommandError(f'{url} вернул {response.status_code}.')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {count} запросов'))
+            for sql in selects:
+                plan = explain(sql)
+                findings = list(find_problems(plan['Plan'], options['rows']))
+                problems += len(findings)
+                if findings or options['verbose_plans']:
+                    self.stdout.write(
+                        f'  {plan["Execution Time"]:.2f} мс  {sql[:200]}')
+                for finding in findings:
+                    self.stdout.write(self.style.WARNING(f'    {finding}'))
+                if options['verbose_plans']:
+                    self.stdout.write(json.dumps(plan['Plan'], indent=2,
+                                                 ensure_ascii=False))
+        return problems
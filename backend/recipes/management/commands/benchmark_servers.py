@@ -0,0 +1,118 @@
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipe
+from users.models import User
+
+# Режим: (приложение, аргументы gunicorn)
+MODES = {
+    'wsgi': ('foodgram.wsgi:application', []),
+    'asgi': ('foodgram.asgi:application',
+             ['--worker-class', 'uvicorn.workers.UvicornWorker']),
+}
+ENDPOINTS = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/{recipe}/',
+    '/api/tags/',
+    '/api/ingredients/?name=%D1%81',
+)
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности режимов WSGI и ASGI."""
+
+    help = ('Запуск gunicorn в режимах WSGI и ASGI на текущей БД '
+            'и замер конкурентных запросов на чтение.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Без токена (ответы из кэша анонимных).')
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.values_list('id', flat=True).first()
+        if recipe is None:
+            raise CommandError('В базе нет рецептов.')
+        headers = {}
+        if not options['anonymous']:
+            user = User.objects.order_by('id').first()
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['Authorization'] = f'Token {token.key}'
+        base = f'http://127.0.0.1:{options["port"]}'
+        urls = [base + url.format(recipe=recipe) for url in ENDPOINTS]
+        for mode in options['modes']:
+            server = self.start_server(mode, options)
+            try:
+                self.wait_ready(server, urls[0], headers)
+                result = self.measure(urls, headers, options)
+            finally:
+                server.terminate()
+                server.wait()
+            self.stdout.write(
+                f'{mode:5} rps={result["rps"]:<9} '
+                f'p50_ms={result["p50_ms"]:<8} p95_ms={result["p95_ms"]:<8} '
+                f'errors={result["errors"]}'
+            )
+
+    @staticmethod
+    def start_server(mode, options):
+        """Запуск gunicorn в отдельном процессе."""
+        application, extra = MODES[mode]
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', application,
+             '--workers', str(options['workers']),
+             '--bind', f'127.0.0.1:{options["port"]}', *extra],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    @staticmethod
+    def fetch(url, headers):
+        """Время запроса в секундах (None при ошибке)."""
+        start = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers)) as response:
+                response.read()
+        except (URLError, OSError):
+            return None
+        return time.perf_counter() - start
+
+    def wait_ready(self, server, url, headers):
+        """Ожидание запуска сервера."""
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while self.fetch(url, headers) is None:
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise CommandError('Сервер не запустился.')
+            time.sleep(0.2)
+
+    def measure(self, urls, headers, options):
+        """Пропускная способность и задержки при конкурентных запросах."""
+        jobs = [urls[i % len(urls)] for i in range(options['requests'])]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            timings = list(executor.map(
+                lambda url: self.fetch(url, headers), jobs))
+        elapsed = time.perf_counter() - start
+        ok = sorted(timing for timing in timings if timing is not None)
+        if not ok:
+            raise CommandError('Все запросы завершились ошибкой.')
+        p95 = ok[min(len(ok) - 1, int(len(ok) * 0.95))]
+        return {
+            'rps': round(len(ok) / elapsed, 1),
+            'p50_ms': round(statistics.median(ok) * 1000, 1),
+            'p95_ms': round(p95 * 1000, 1),
+            'errors': len(timings) - len(ok),
+        }
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from shortlink.models import ShortLink
+
+
+class Command(BaseCommand):
+    """Удаление повторных коротких ссылок на один адрес."""
+
+    help = ('Оставляет по одной (самой ранней) короткой ссылке на адрес. '
+            'Коды удалённых ссылок перестают работать.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать повторы.')
+
+    def handle(self, *args, **options):
+        first_ids = ShortLink.objects.values('full_url').annotate(
+            first_id=Min('id')).values('first_id')
+        duplicates = ShortLink.objects.exclude(id__in=first_ids)
+        if options['dry_run']:
+            self.stdout.write(f'Повторных ссылок: {duplicates.count()}.')
+            return
+        deleted, _ = duplicates.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено повторных ссылок: {deleted}.'))
@@ -0,0 +1,121 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+BATCH_SIZE = 1000
+USERNAME_PREFIX = 'fake_user_'
+FAKE_IMAGE = 'recipes/fake.png'
+FAKE_TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'))
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочных замеров."""
+
+    help = 'Создание пользователей, рецептов, подписок, избранного и покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--favorites', type=int, default=10,
+                            help='Среднее число избранных на пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Среднее число покупок на пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Среднее число подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        tags = self.get_tags()
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredients:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+                for i in range(200)
+            )
+            ingredients = list(
+                Ingredient.objects.values_list('id', flat=True))
+
+        users = self.create_users(options['users'])
+        recipes = self.create_recipes(rnd, users, options['recipes'])
+        self.bulk_create(IngredientRecipe, (
+            IngredientRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=rnd.randint(1, 500))
+            for recipe in recipes
+            for ingredient in rnd.sample(ingredients,
+                                         min(len(ingredients),
+                                             rnd.randint(3, 8)))
+        ))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in rnd.sample(tags, rnd.randint(1, len(tags)))
+        ))
+        for model, average in ((Favorite, options['favorites']),
+                               (ShoppingCart, options['carts'])):
+            self.bulk_create(model, (
+                model(user_id=user, recipe_id=recipe)
+                for user in users
+                for recipe in rnd.sample(
+                    recipes, min(len(recipes), rnd.randint(0, 2 * average)))
+            ))
+        self.bulk_create(Subscribe, (
+            Subscribe(user_id=user, author_id=author)
+            for user in users
+            for author in rnd.sample(
+                users, min(len(users),
+                           rnd.randint(0, 2 * options['subscriptions'])))
+            if author != user
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: {len(recipes)}.'
+        ))
+
+    @staticmethod
+    def bulk_create(model, objs):
+        """Пакетная вставка с пропуском дубликатов."""
+        model.objects.bulk_create(objs, batch_size=BATCH_SIZE,
+                                  ignore_conflicts=True)
+
+    @staticmethod
+    def get_tags():
+        """Существующие теги или набор тегов по умолчанию."""
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(Tag(name=name, slug=slug)
+                                    for name, slug in FAKE_TAGS)
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        """Создание пользователей с общим хэшем пароля."""
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX).count()
+        password = make_password(USERNAME_PREFIX)
+        self.bulk_create(User, (
+            User(username=f'{USERNAME_PREFIX}{i}',
+                 email=f'{USERNAME_PREFIX}{i}@example.com',
+                 first_name='Имя', last_name='Фамилия', password=password)
+            for i in range(start, start + count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('-id').values_list('id', flat=True)[:count])
+
+    def create_recipes(self, rnd, users, count):
+        """Создание рецептов случайных авторов."""
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        self.bulk_create(Recipe, (
+            Recipe(name=f'Рецепт {i}', author_id=rnd.choice(users),
+                   text='Описание рецепта. ' * rnd.randint(1, 20),
+                   image=FAKE_IMAGE, cooking_time=rnd.randint(1, 180))
+            for i in range(count)
+        ))
+        return list(Recipe.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True))
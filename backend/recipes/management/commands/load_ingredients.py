@@ -1,39 +1,140 @@
 import csv
+import io
+import json
 import os
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from progress.bar import IncrementalBar
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from progress.counter import Counter
 
+from api.cache import bump_version
 from recipes.models import Ingredient
 
+BATCH_SIZE = 5000
+READ_SIZE = 64 * 1024
+CSV_HEADER = ['name', 'measurement_unit']
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1]
-    )
+
+def read_csv(file):
+    """Строки CSV-файла (name, measurement_unit)."""
+    for row in csv.reader(file):
+        if row and row != CSV_HEADER:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Объекты JSON-массива, читаемые с диска по частям."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный JSON-файл.')
+                break
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            return
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
 
 
 class Command(BaseCommand):
-    """Загрузка ингредиентов из csv файла."""
+    """Загрузка ингредиентов из csv или json файла."""
 
-    help = 'Загрузка из csv файла.'
+    help = 'Загрузка ингредиентов из csv или json файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data',
+                                 'ingredients.csv'))
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
 
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+        path = options['path']
         if not os.path.exists(path):
             self.stdout.write(self.style.ERROR(f'Файл {path} не найден.'
                                                'Убедитесь,что он существует.'))
             return
-        with open(path, 'r', encoding='utf-8') as file:
-            row_count = sum(1 for row in file)
-        with open(path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            bar = IncrementalBar('ingredients.csv'.ljust(17), max=row_count)
-            next(reader)
-            for row in reader:
-                bar.next()
-                ingredient_create(row)
-            bar.finish()
-        self.stdout.write('Все ингредиенты успешно загружены!')
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+
+        with open(path, 'r', encoding='utf-8') as file, \
+                transaction.atomic():
+            rows = (
+                (name.strip(), unit.strip()) for name, unit in reader(file)
+            )
+            if connection.vendor == 'postgresql':
+                total, inserted = self.copy_rows(rows, options['batch_size'])
+            else:
+                total, inserted = self.bulk_create_rows(
+                    rows, options['batch_size'])
+        bump_version(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {inserted}, пропущено дубликатов: '
+            f'{total - inserted}.'
+        ))
+
+    @staticmethod
+    def batches(rows, batch_size):
+        """Разбиение строк на пачки с выводом прогресса."""
+        counter = Counter('ingredients'.ljust(17))
+        while batch := list(islice(rows, batch_size)):
+            counter.next(len(batch))
+            yield batch
+        counter.finish()
+
+    def bulk_create_rows(self, rows, batch_size):
+        """Вставка пачками через bulk_create с пропуском дубликатов."""
+        total = 0
+        before = Ingredient.objects.count()
+        for batch in self.batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+        return total, Ingredient.objects.count() - before
+
+    def copy_rows(self, rows, batch_size):
+        """Загрузка через COPY во временную таблицу и INSERT ON CONFLICT."""
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE tmp_ingredients '
+                '(name text, measurement_unit text) ON COMMIT DROP')
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY tmp_ingredients FROM STDIN WITH (FORMAT csv)',
+                    buffer)
+                total += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit FROM tmp_ingredients '
+                'ON CONFLICT ON CONSTRAINT uniq_ingredient_fields DO NOTHING')
+            return total, cursor.rowcount
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from progress.bar import Bar
+
+from api.images import (get_executor, process_safely, run_in_thread,
+                        thumbnails_outdated)
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Построение миниатюр для уже загруженных изображений."""
+
+    help = 'Очистка метаданных и построение миниатюр WebP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Обработать и актуальные изображения.')
+
+    def handle(self, *args, **options):
+        for model in (Recipe, User):
+            objects = model.objects.exclude(
+                **{model.image_field: ''}
+            ).exclude(
+                **{f'{model.image_field}__isnull': True}
+            ).only('pk', model.image_field, model.thumbnails_field)
+            jobs = [
+                (model, instance.pk,
+                 getattr(instance, model.image_field).name)
+                for instance in objects.iterator()
+                if options['all'] or thumbnails_outdated(instance)
+            ]
+            bar = Bar(model._meta.verbose_name_plural.ljust(17),
+                      max=len(jobs))
+            if settings.IMAGE_PROCESSING_WORKERS:
+                for _ in get_executor().map(lambda job: run_in_thread(*job),
+                                            jobs):
+                    bar.next()
+            else:
+                for job in jobs:
+                    process_safely(*job)
+                    bar.next()
+            bar.finish()
+        self.stdout.write(self.style.SUCCESS('Изображения обработаны.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    """Пересчёт итогов списков покупок."""
+
+    help = 'Пересчёт итогов списков покупок по рецептам в корзинах.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ShoppingCartTotal.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Итогов списков покупок: {ShoppingCartTotal.objects.count()}.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Сверка счётчиков избранного и покупок у рецептов."""
+
+    help = 'Пересчёт favorites_count и in_carts_count по таблицам связей.'
+
+    def handle(self, *args, **options):
+        updated = Recipe.objects.recount_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны у рецептов: {updated}.'))
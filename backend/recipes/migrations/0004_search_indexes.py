@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INDEXES = (
+    ('recipes_recipe_name_trgm', 'recipes_recipe',
+     'USING gin (name gin_trgm_ops)'),
+    ('recipes_recipe_search_vector', 'recipes_recipe',
+     "USING gin ((setweight(to_tsvector('russian'::regconfig, "
+     "(COALESCE(name, ''))::text), 'A') || "
+     "setweight(to_tsvector('russian'::regconfig, "
+     "COALESCE(text, '')), 'B')))"),
+    ('recipes_ingredient_name_trgm', 'recipes_ingredient',
+     'USING gin (name gin_trgm_ops)'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_auto_20241124_2122'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
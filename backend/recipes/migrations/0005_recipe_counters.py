@@ -0,0 +1,39 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = {}
+    for model_name, field in (('Favorite', 'favorites_count'),
+                              ('ShoppingCart', 'in_carts_count')):
+        model = apps.get_model('recipes', model_name)
+        counters[field] = Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).values(
+                'recipe').annotate(total=Count('pk')).values('total')
+        ), 0)
+    Recipe.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
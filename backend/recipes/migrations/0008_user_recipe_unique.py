@@ -0,0 +1,63 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    removed = False
+    for model_name, field in (('Favorite', 'favorites_count'),
+                              ('ShoppingCart', 'in_carts_count')):
+        model = apps.get_model('recipes', model_name)
+        duplicates = model.objects.values('user', 'recipe').annotate(
+            first=Min('id'), total=Count('id')
+        ).filter(total__gt=1).order_by()
+        if not duplicates.exists():
+            continue
+        for row in duplicates.iterator():
+            model.objects.filter(
+                user=row['user'], recipe=row['recipe']
+            ).exclude(id=row['first']).delete()
+        removed = True
+        Recipe.objects.update(**{field: Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).values(
+                'recipe').annotate(total=Count('pk')).values('total')
+        ), 0)})
+    if not removed:
+        return
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+    ShoppingCartTotal.objects.all().delete()
+    rows = ShoppingCart.objects.filter(
+        recipe__recipe__isnull=False
+    ).values('user', 'recipe__recipe__ingredient').annotate(
+        amount=Sum('recipe__recipe__amount')
+    ).order_by()
+    ShoppingCartTotal.objects.bulk_create(
+        (ShoppingCartTotal(user_id=row['user'],
+                           ingredient_id=row['recipe__recipe__ingredient'],
+                           amount=row['amount'])
+         for row in rows.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_shopping_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='uniq_user_recipe_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='uniq_user_recipe_shoppingcart'),
+        ),
+    ]
@@ -1,10 +1,12 @@
 """Модели приложения recipes."""
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Model, UniqueConstraint
+from django.db import connection, models
+from django.db.models import (Count, F, Model, OuterRef, Prefetch, QuerySet,
+                              Subquery, Sum, UniqueConstraint)
+from django.db.models.functions import Coalesce, Greatest
 
 from foodgram import constants
-from users.models import User
+from users.models import User, UserLinkQuerySet
 
 
 class Ingredient(Model):
@@ -52,6 +54,29 @@ class Tag(Model):
         return self.name
 
 
+class RecipeQuerySet(QuerySet):
+    """Запросы для чтения рецептов."""
+
+    def recount_counters(self):
+        """Пересчёт счётчиков избранного и покупок по таблицам связей."""
+        return self.update(**{
+            model.counter_field: Coalesce(Subquery(
+                model.objects.filter(recipe=OuterRef('pk')).values(
+                    'recipe').annotate(total=Count('pk')).values('total')
+            ), 0)
+            for model in (Favorite, ShoppingCart)
+        })
+
+    def with_related(self):
+        """Подгрузка автора, тегов и ингредиентов с количеством."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('recipe',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient')),
+        )
+
+
 class Recipe(Model):
     """Модель Рецепта."""
 
@@ -90,12 +115,40 @@ class Recipe(Model):
         related_name='recipes',
         verbose_name='Теги'
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    thumbnails = models.JSONField(
+        verbose_name='Миниатюры',
+        default=dict,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    image_field = 'image'
+    thumbnails_field = 'thumbnails'
+    thumbnail_sizes = ('card', 'detail')
 
     class Meta:
         """Класс Meta для модели Recipe."""
         ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=('author', '-id'),
+                         name='recipe_author_id_idx'),
+            models.Index(
+                fields=('-favorites_count', '-in_carts_count', '-id'),
+                name='recipe_popular_idx'),
+        ]
 
     def __str__(self):
         return f'Рецепт "{self.name}" составил: {self.author}'
@@ -149,6 +202,12 @@ class IngredientRecipe(Model):
                 f'{self.ingredient.measurement_unit}')
 
 
+class UserRecipeQuerySet(UserLinkQuerySet):
+    """Избранное и списки покупок."""
+
+    target_field = 'recipe'
+
+
 class UserRecipe(Model):
     """Абстрактная модель."""
 
@@ -163,13 +222,15 @@ class UserRecipe(Model):
         verbose_name='Рецепт'
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         """Класс Meta для модели UserRecipe."""
         abstract = True
         constraints = [
             UniqueConstraint(
                 fields=['user', 'recipe'],
-                name='uniq_user_recipe',
+                name='uniq_user_recipe_%(class)s',
             )
         ]
 
@@ -177,7 +238,9 @@ class UserRecipe(Model):
 class Favorite(UserRecipe):
     """Модель Избранное."""
 
-    class Meta:
+    counter_field = 'favorites_count'
+
+    class Meta(UserRecipe.Meta):
         """Класс Meta модели Favorite."""
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -190,7 +253,9 @@ class Favorite(UserRecipe):
 class ShoppingCart(UserRecipe):
     """Модель Списка покупок."""
 
-    class Meta:
+    counter_field = 'in_carts_count'
+
+    class Meta(UserRecipe.Meta):
         """Класс Meta модели ShoppingCart."""
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -198,3 +263,124 @@ class ShoppingCart(UserRecipe):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в список покупок'
+
+
+class ShoppingCartTotalQuerySet(QuerySet):
+    """Инкрементальное обновление итогов списков покупок."""
+
+    def add_recipe(self, recipe_id, user_id=None):
+        """Прибавление ингредиентов рецепта к итогам.
+
+        Без user_id обновляются итоги всех пользователей, у которых
+        рецепт в списке покупок.
+        """
+        total = self.model._meta.db_table
+        sql = (
+            f'INSERT INTO {total} (user_id, ingredient_id, amount) '
+            'SELECT cart.user_id, item.ingredient_id, item.amount '
+            f'FROM {ShoppingCart._meta.db_table} cart '
+            f'JOIN {IngredientRecipe._meta.db_table} item '
+            'ON item.recipe_id = cart.recipe_id '
+            'WHERE cart.recipe_id = %s'
+        )
+        params = [recipe_id]
+        if user_id is not None:
+            sql += ' AND cart.user_id = %s'
+            params.append(user_id)
+        sql += (' ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {total}.amount + excluded.amount')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def remove_recipe(self, recipe_id, user_id=None):
+        """Вычитание ингредиентов рецепта и удаление нулевых итогов.
+
+        С user_id вычитание делается без проверки списка покупок:
+        вызывающий код уже удалил или удаляет рецепт из него.
+        """
+        items = IngredientRecipe.objects.filter(recipe_id=recipe_id)
+        totals = self.filter(ingredient__in=items.values('ingredient'))
+        if user_id is None:
+            totals = totals.filter(user__in=ShoppingCart.objects.filter(
+                recipe_id=recipe_id).values('user'))
+        else:
+            totals = totals.filter(user_id=user_id)
+        # Итоги могли разойтись с рецептом после записи в обход сигналов
+        totals.update(amount=Greatest(F('amount') - Subquery(
+            items.filter(ingredient=OuterRef('ingredient')).values(
+                'amount')[:1]), 0))
+        totals.filter(amount__lte=0).delete()
+
+    def add_item(self, recipe_id, ingredient_id, amount):
+        """Прибавление строки рецепта к итогам всех списков с рецептом."""
+        total = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {total} (user_id, ingredient_id, amount) '
+                f'SELECT user_id, %s, %s FROM {ShoppingCart._meta.db_table} '
+                'WHERE recipe_id = %s '
+                'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                f'SET amount = {total}.amount + excluded.amount',
+                [ingredient_id, amount, recipe_id])
+
+    def remove_item(self, recipe_id, ingredient_id, amount):
+        """Вычитание строки рецепта из итогов всех списков с рецептом."""
+        totals = self.filter(
+            ingredient_id=ingredient_id,
+            user__in=ShoppingCart.objects.filter(
+                recipe_id=recipe_id).values('user'))
+        totals.update(amount=Greatest(F('amount') - amount, 0))
+        totals.filter(amount__lte=0).delete()
+
+    def rebuild(self, user_id=None):
+        """Пересчёт итогов всех списков покупок или одного пользователя."""
+        carts = ShoppingCart.objects.filter(recipe__recipe__isnull=False)
+        totals = self.all()
+        if user_id is not None:
+            carts = carts.filter(user_id=user_id)
+            totals = totals.filter(user_id=user_id)
+        rows = carts.values('user', 'recipe__recipe__ingredient').annotate(
+            amount=Sum('recipe__recipe__amount')
+        ).order_by()
+        totals.delete()
+        self.bulk_create(
+            (self.model(user_id=row['user'],
+                        ingredient_id=row['recipe__recipe__ingredient'],
+                        amount=row['amount'])
+             for row in rows.iterator()),
+            batch_size=5000,
+        )
+
+
+class ShoppingCartTotal(Model):
+    """Итоговое количество ингредиента в списке покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    objects = ShoppingCartTotalQuerySet.as_manager()
+
+    class Meta:
+        """Класс Meta модели ShoppingCartTotal."""
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='uniq_cart_total_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
@@ -0,0 +1,62 @@
+import os
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, ShoppingCartTotal
+from users.models import User
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-baseline', action='store_true',
+                     help='Записать замеры бенчмарка как новый бюджет.')
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш ответов и счётчиков не переживает тест."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(scope='module')
+def fake_data(django_db_setup, django_db_blocker):
+    """Синтетические данные на модуль тестов с откатом в конце.
+
+    Тесты модуля не помечаются django_db: TestCase закрывает соединение
+    после каждого теста, и на PostgreSQL данные откатывались бы сразу.
+    """
+    with django_db_blocker.unblock(), transaction.atomic():
+        call_command('generate_fake_data',
+                     users=int(os.getenv('BENCHMARK_USERS', 2000)),
+                     recipes=int(os.getenv('BENCHMARK_RECIPES', 20000)),
+                     stdout=StringIO())
+        # Без статистики планировщик выбирает для пересчёта вложенные циклы
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # bulk_create обходит сигналы: счётчики и итоги корзин пересчитываются
+        Recipe.objects.recount_counters()
+        ShoppingCartTotal.objects.rebuild()
+        yield
+        transaction.set_rollback(True)
+
+
+def token_client(user):
+    """Клиент API с токеном пользователя."""
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def create_user(username):
+    """Пользователь с заполненными обязательными полями."""
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name=username, last_name=username, password='password')
@@ -0,0 +1,78 @@
+import pytest
+from django.core.cache import cache
+
+from api.authentication import USER_FIELDS, token_cache_key
+from users.models import User
+
+from .conftest import create_user, token_client
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return create_user('user')
+
+
+@pytest.fixture
+def client(user):
+    return token_client(user)
+
+
+def cached(client):
+    key = client._credentials['HTTP_AUTHORIZATION'].split()[1]
+    return cache.get(token_cache_key(key)), key
+
+
+def test_cache_holds_no_credentials(client, user):
+    assert client.get('/api/users/me/').status_code == 200
+    values, key = cached(client)
+    assert set(values) == set(USER_FIELDS)
+    assert all(isinstance(value, (int, str, bool))
+               for value in values.values())
+    assert user.password not in repr(values)
+    assert key not in repr(values)
+
+
+def test_cached_user_skips_token_query(client, user,
+                                       django_assert_num_queries):
+    client.get('/api/tags/')
+    with django_assert_num_queries(0):
+        response = client.get('/api/tags/')
+    assert response.status_code == 200
+    response = client.get('/api/users/me/')
+    assert response.data['email'] == user.email
+    assert response.data['username'] == user.username
+
+
+def test_cached_user_save_keeps_other_fields(client, user, settings,
+                                             tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    client.get('/api/users/me/')
+    password = User.objects.get(id=user.id).password
+    response = client.put('/api/users/me/avatar/', {
+        'avatar': ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB'
+                   'CAIAAACQd1PeAAAADElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSu'
+                   'QmCC')}, format='json')
+    assert response.status_code == 200
+    saved = User.objects.get(id=user.id)
+    assert saved.password == password
+    assert saved.email == user.email
+    assert saved.avatar
+
+
+def test_password_change_and_deactivation_reset_cache(client, user):
+    client.get('/api/users/me/')
+    user.set_password('new-password')
+    user.save()
+    assert cached(client)[0] is None
+    client.get('/api/users/me/')
+    user.is_active = False
+    user.save()
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_logout_resets_cache(client):
+    client.get('/api/users/me/')
+    assert client.post('/api/auth/token/logout/').status_code == 204
+    assert client.get('/api/users/me/').status_code == 401
@@ -0,0 +1,123 @@
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import pytest
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+from .conftest import token_client
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'data',
+                             'benchmark_baseline.json')
+PAGE_SIZES = (6, 50)
+REPEAT = int(os.getenv('BENCHMARK_REPEAT', 5))
+# Запас к замеренным времени и памяти при обновлении бюджета.
+HEADROOM = 3
+
+# (имя, url, нужна ли авторизация, зависит ли от размера страницы)
+ENDPOINTS = (
+    ('recipes_list', '/api/recipes/?limit={limit}', False, True),
+    ('recipes_list_auth', '/api/recipes/?limit={limit}', True, True),
+    ('recipes_list_filtered',
+     '/api/recipes/?limit={limit}&is_favorited=1&tags=breakfast', True, True),
+    ('recipe_detail', '/api/recipes/{recipe}/', True, False),
+    ('subscriptions',
+     '/api/users/subscriptions/?limit={limit}&recipes_limit=3', True, True),
+    ('users_list', '/api/users/?limit={limit}', True, True),
+    ('ingredients_search', '/api/ingredients/?name=с', False, False),
+    ('tags', '/api/tags/', False, False),
+    ('download_shopping_cart',
+     '/api/recipes/download_shopping_cart/', True, False),
+)
+CASES = [
+    (f'{name}[limit={limit}]' if paginated else name, url, auth, limit)
+    for name, url, auth, paginated in ENDPOINTS
+    for limit in (PAGE_SIZES if paginated else (None,))
+]
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope='module')
+def baseline(request):
+    """Бюджет из файла; с --update-baseline замеры записываются в файл."""
+    if not request.config.getoption('--update-baseline'):
+        with open(BASELINE_PATH, encoding='utf-8') as file:
+            yield json.load(file)
+        return
+    results = {}
+    yield results
+    with open(BASELINE_PATH, 'w', encoding='utf-8') as file:
+        json.dump({
+            key: {
+                'queries': result['queries'],
+                'time_ms': round(result['time_ms'] * HEADROOM, 2),
+                'peak_kb': result['peak_kb'] * HEADROOM,
+            }
+            for key, result in results.items()
+        }, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+@pytest.fixture(scope='module')
+def clients(fake_data):
+    """Анонимный клиент и клиент пользователя с самой большой корзиной."""
+    user = User.objects.annotate(
+        carts=Count('shopping_recipe')
+    ).order_by('-carts').first()
+    return {False: APIClient(), True: token_client(user)}
+
+
+@pytest.fixture(scope='module')
+def recipe(fake_data):
+    return Recipe.objects.values_list('id', flat=True).first()
+
+
+def measure(client, url):
+    """Число запросов, медианное время и пиковая память запроса."""
+    # Тестовый клиент шлёт request_started, а он очищает журнал запросов
+    # соединения: считать нужно сразу после ответа.
+    connection.ensure_connection()
+    reset_queries()
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url)
+    queries = len(captured)
+    assert response.status_code < 400, f'{url} вернул {response.status_code}'
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        client.get(url)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'queries': queries,
+        'time_ms': round(statistics.median(timings) * 1000, 2),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+@pytest.mark.parametrize('key, url, auth, limit', CASES,
+                         ids=[case[0] for case in CASES])
+def test_endpoint_budget(request, baseline, clients, recipe,
+                         key, url, auth, limit):
+    result = measure(clients[auth], url.format(limit=limit, recipe=recipe))
+    if request.config.getoption('--update-baseline'):
+        baseline[key] = result
+        return
+    assert key in baseline, f'Нет бюджета для {key}'
+    exceeded = {metric: f'{result[metric]} > {limit}'
+                for metric, limit in baseline[key].items()
+                if result[metric] > limit}
+    assert not exceeded, f'{key}: превышен бюджет {exceeded}'
@@ -0,0 +1,159 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+from .conftest import create_user, token_client
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def author():
+    return create_user('author')
+
+
+@pytest.fixture
+def tag():
+    Tag.objects.create(name='Обед', slug='lunch')
+    return Tag.objects.create(name='Завтрак', slug='breakfast')
+
+
+@pytest.fixture
+def recipes(author, tag, ingredients):
+    recipes = []
+    for i in range(3):
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {i}', author=author, text='Текст',
+            image='recipes/test.png', cooking_time=10)
+        recipe.tags.add(tag)
+        IngredientRecipe.objects.create(recipe=recipe,
+                                        ingredient=ingredients[i], amount=10)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def ingredients():
+    return [Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Сахар', 'Соль', 'Мука')]
+
+
+class TestIngredientSearch:
+
+    def test_etag_and_not_modified(self, client, ingredients):
+        response = client.get('/api/ingredients/?name=с')
+        assert response.status_code == 200
+        assert [item['name'] for item in response.data] == ['Сахар', 'Соль']
+        assert response['ETag']
+        assert 'max-age' in response['Cache-Control']
+        response = client.get('/api/ingredients/?name=с',
+                              HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
+    def test_cached_search_skips_index(self, client, ingredients,
+                                       monkeypatch):
+        calls = []
+        search = ingredient_index.search
+        monkeypatch.setattr(ingredient_index, 'search',
+                            lambda name: calls.append(name) or search(name))
+        client.get('/api/ingredients/?name=м')
+        response = client.get('/api/ingredients/?name=м')
+        assert [item['name'] for item in response.data] == ['Мука']
+        assert calls == ['м']
+
+    def test_ingredient_change_resets_search(self, client, ingredients):
+        etag = client.get('/api/ingredients/?name=с')['ETag']
+        Ingredient.objects.create(name='Сода', measurement_unit='г')
+        response = client.get('/api/ingredients/?name=с',
+                              HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert len(response.data) == 3
+
+
+def recipe_ids(response):
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def change_recipe(recipes, **kwargs):
+    recipes[0].name = 'Новое название'
+    recipes[0].save()
+
+
+def change_ingredient_amount(recipes, **kwargs):
+    item = recipes[0].recipe.get()
+    item.amount = 99
+    item.save()
+
+
+def change_tag(tag, **kwargs):
+    tag.name = 'Полдник'
+    tag.save()
+
+
+def change_author(author, **kwargs):
+    author.first_name = 'Новое имя'
+    author.save()
+
+
+class TestAnonymousCache:
+
+    URL = '/api/recipes/?limit=6&tags=breakfast&tags=lunch'
+
+    def test_key_ignores_parameter_order(self, client, recipes,
+                                         django_assert_num_queries):
+        response = client.get(self.URL)
+        assert response.status_code == 200
+        with django_assert_num_queries(0):
+            cached = client.get(
+                '/api/recipes/?tags=lunch&limit=6&tags=breakfast')
+        assert cached.data == response.data
+        with django_assert_num_queries(0):
+            client.get('/api/recipes/?tags=breakfast&tags=lunch&limit=6')
+
+    def test_different_parameters_are_not_shared(self, client, recipes):
+        client.get(self.URL)
+        response = client.get('/api/recipes/?limit=1&tags=breakfast')
+        assert len(response.data['results']) == 1
+
+    @pytest.mark.parametrize('change', (
+        change_recipe, change_ingredient_amount, change_tag, change_author))
+    def test_invalidated_on_commit(self, client, recipes, tag, author,
+                                   change, django_assert_num_queries,
+                                   django_capture_on_commit_callbacks):
+        url = f'/api/recipes/{recipes[0].id}/'
+        before = client.get(url).data
+        with django_capture_on_commit_callbacks() as callbacks:
+            change(recipes=recipes, tag=tag, author=author)
+        # До коммита транзакции ответ ещё берётся из кэша
+        with django_assert_num_queries(0):
+            assert client.get(url).data == before
+        for callback in callbacks:
+            callback()
+        after = client.get(url).data
+        assert after != before
+
+    def test_authenticated_requests_bypass_cache(self, client, recipes,
+                                                 author):
+        client.get(self.URL)
+        auth_client = token_client(author)
+        auth_client.get(self.URL)
+        recipes[0].name = 'Новое название'
+        recipes[0].save()
+        response = auth_client.get(self.URL)
+        assert 'Новое название' in [recipe['name']
+                                    for recipe in response.data['results']]
+
+    def test_popular_ordering_follows_favorites(self, client, recipes,
+                                                author):
+        url = '/api/recipes/?ordering=popular'
+        assert recipe_ids(client.get(url))[0] == recipes[2].id
+        token_client(author).post(f'/api/recipes/{recipes[0].id}/favorite/')
+        assert recipe_ids(client.get(url))[0] == recipes[0].id
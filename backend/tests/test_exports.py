@@ -0,0 +1,75 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api import exports
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+from .conftest import create_user, token_client
+
+URL = '/api/recipes/download_shopping_cart/'
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return create_user('user')
+
+
+@pytest.fixture
+def client(user):
+    recipe = Recipe.objects.create(
+        name='Рецепт', author=create_user('author'), text='Текст',
+        image='recipes/test.png', cooking_time=10)
+    IngredientRecipe.objects.create(
+        recipe=recipe, amount=100,
+        ingredient=Ingredient.objects.create(name='Мука',
+                                             measurement_unit='г'))
+    client = token_client(user)
+    client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+    return client
+
+
+def content(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.parametrize('accept', (None, 'application/json', '*/*',
+                                    'text/html'))
+def test_unmatched_accept_falls_back_to_text(client, accept):
+    headers = {'HTTP_ACCEPT': accept} if accept else {}
+    response = client.get(URL, **headers)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    assert '- Мука (г) - 100' in content(response)
+
+
+@pytest.mark.parametrize('query, accept, content_type', (
+    ('?format=csv', None, 'text/csv; charset=utf-8'),
+    ('', 'text/csv', 'text/csv; charset=utf-8'),
+    ('?format=pdf', 'application/json', 'application/pdf'),
+))
+def test_format_selection(client, query, accept, content_type):
+    headers = {'HTTP_ACCEPT': accept} if accept else {}
+    response = client.get(URL + query, **headers)
+    assert response.status_code == 200
+    assert response['Content-Type'] == content_type
+
+
+def test_unknown_format(client):
+    assert client.get(URL + '?format=xml').status_code == 404
+
+
+def test_missing_pdf_font_fails_before_streaming(client, settings,
+                                                 monkeypatch):
+    monkeypatch.setattr(exports, 'PDF_FONT', 'MissingShoppingListFont')
+    settings.SHOPPING_LIST_PDF_FONT = '/nonexistent/font.ttf'
+    client.raise_request_exception = False
+    response = client.get(URL + '?format=pdf')
+    assert response.status_code == 500
+    assert not response.streaming
+
+
+def test_anonymous(client):
+    response = APIClient().get(URL, HTTP_ACCEPT='application/json')
+    assert response.status_code == 401
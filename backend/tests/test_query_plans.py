@@ -0,0 +1,39 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from api.query_plans import find_problems
+
+pytestmark = pytest.mark.benchmark
+
+
+def node(node_type, rows, removed=0, plans=()):
+    return {'Node Type': node_type, 'Relation Name': 'recipes_recipe',
+            'Actual Rows': rows, 'Actual Loops': 1,
+            'Rows Removed by Filter': removed, 'Plans': list(plans)}
+
+
+@pytest.mark.parametrize('plan, problems', (
+    (node('Seq Scan', 5000), 0),
+    (node('Seq Scan', 10, removed=5000), 1),
+    (node('Seq Scan', 10, removed=500), 0),
+    (node('Limit', 6, plans=[node('Sort', 6, plans=[
+        node('Index Scan', 5000)])]), 1),
+    (node('Sort', 6, plans=[node('Index Scan', 50)]), 0),
+), ids=('full_scan', 'filtered_scan', 'small_scan', 'big_sort',
+        'small_sort'))
+def test_find_problems(plan, problems):
+    assert len(list(find_problems(plan))) == problems
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='EXPLAIN (ANALYZE, BUFFERS) есть только '
+                           'в PostgreSQL')
+def test_audit_queries(fake_data):
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    stdout = StringIO()
+    call_command('audit_queries', existing_data=True, stdout=stdout)
+    assert 'Проблемных планов нет' in stdout.getvalue()
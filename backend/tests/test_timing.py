@@ -0,0 +1,67 @@
+import re
+
+import pytest
+from rest_framework.test import APIClient
+
+from api.serializers import TagSerializer
+from api.timing import timed
+from recipes.models import Recipe, Tag
+
+from .conftest import create_user
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def client(settings):
+    settings.SERVER_TIMING_SAMPLE_RATE = 1
+    return APIClient()
+
+
+@pytest.fixture
+def recipes():
+    author = create_user('author')
+    tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(name=f'Рецепт {i}', author=author, text='Текст',
+               image='recipes/test.png', cooking_time=10)
+        for i in range(20))
+    for recipe in Recipe.objects.all():
+        recipe.tags.add(tag)
+    return recipes
+
+
+def metrics(response):
+    return {name: float(value) for name, value in re.findall(
+        r'(\w+);dur=([\d.]+)', response['Server-Timing'])}
+
+
+def test_server_timing_reports_serializers_separately(client, recipes):
+    response = client.get('/api/recipes/?limit=20')
+    assert response.status_code == 200
+    timing = metrics(response)
+    assert set(timing) == {'db', 'view', 'ser', 'render', 'total'}
+    assert timing['ser'] > 0
+    assert timing['total'] >= timing['view'] + timing['ser']
+    assert 'desc="serializers"' in response['Server-Timing']
+
+
+def test_directly_created_serializers_are_timed(client, recipes):
+    client.force_authenticate(create_user('user'))
+    response = client.post(f'/api/recipes/{Recipe.objects.first().id}'
+                           '/favorite/')
+    assert response.status_code == 201
+    assert metrics(response)['ser'] > 0
+
+
+def test_disabled_without_sample_rate(settings, recipes):
+    settings.SERVER_TIMING_SAMPLE_RATE = 0
+    response = APIClient().get('/api/recipes/')
+    assert 'Server-Timing' not in response
+
+
+def test_timed_outside_sample_keeps_class():
+    serializer = TagSerializer(Tag.objects.none(), many=True)
+    serializer_class = type(serializer)
+    assert type(timed(serializer)) is serializer_class
+    assert timed(serializer).data == []
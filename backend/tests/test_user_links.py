@@ -0,0 +1,339 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag)
+from users.models import Subscribe
+
+from .conftest import create_user, token_client
+
+MISSING = 10 ** 6
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQ'
+         'd1PeAAAADElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC')
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return create_user('user')
+
+
+@pytest.fixture
+def author():
+    return create_user('author')
+
+
+@pytest.fixture
+def client(user):
+    return token_client(user)
+
+
+@pytest.fixture
+def ingredients():
+    return [Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Сахар', 'Соль')]
+
+
+@pytest.fixture
+def recipes(author, ingredients):
+    """Три рецепта: мука и сахар, мука и соль, только сахар."""
+    flour, sugar, salt = ingredients
+    recipes = [Recipe.objects.create(
+        name=f'Рецепт {i}', author=author, text='Текст',
+        image='recipes/test.png', cooking_time=10) for i in range(3)]
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(recipe=recipes[0], ingredient=flour, amount=100),
+        IngredientRecipe(recipe=recipes[0], ingredient=sugar, amount=20),
+        IngredientRecipe(recipe=recipes[1], ingredient=flour, amount=200),
+        IngredientRecipe(recipe=recipes[1], ingredient=salt, amount=5),
+        IngredientRecipe(recipe=recipes[2], ingredient=sugar, amount=30),
+    ])
+    return recipes
+
+
+def counters(recipes, field):
+    values = dict(Recipe.objects.values_list('id', field))
+    return [values[recipe.id] for recipe in recipes]
+
+
+def totals(user):
+    return dict(ShoppingCartTotal.objects.filter(user=user).values_list(
+        'ingredient__name', 'amount'))
+
+
+def results(response):
+    return {row['id']: row['status'] for row in response.data['results']}
+
+
+class TestUserLinkQuerySet:
+
+    def test_add_many_returns_created_and_skips_existing(self, user,
+                                                         recipes):
+        ids = [recipe.id for recipe in recipes]
+        assert Favorite.objects.add_many(user.id, ids[:2]) == set(ids[:2])
+        assert Favorite.objects.add_many(user.id, ids) == {ids[2]}
+        assert Favorite.objects.add_many(user.id, ids) == set()
+        assert Favorite.objects.filter(user=user).count() == 3
+
+    def test_add_many_skips_missing_targets(self, user, recipes):
+        assert Favorite.objects.add_many(
+            user.id, [recipes[0].id, MISSING]) == {recipes[0].id}
+        assert not Favorite.objects.filter(recipe_id=MISSING).exists()
+
+    def test_empty_ids(self, user):
+        assert Favorite.objects.add_many(user.id, []) == set()
+        assert Favorite.objects.remove_many(user.id, []) == set()
+
+    def test_remove_many_returns_deleted(self, user, author, recipes):
+        ids = [recipe.id for recipe in recipes]
+        ShoppingCart.objects.add_many(user.id, ids[:2])
+        ShoppingCart.objects.add_many(author.id, ids)
+        assert ShoppingCart.objects.remove_many(
+            user.id, [*ids, MISSING]) == set(ids[:2])
+        assert ShoppingCart.objects.remove_many(user.id, ids) == set()
+        assert ShoppingCart.objects.filter(user=author).count() == 3
+
+    def test_add_and_remove_single(self, user, author):
+        assert Subscribe.objects.add(user.id, author.id)
+        assert not Subscribe.objects.add(user.id, author.id)
+        assert not Subscribe.objects.add(user.id, MISSING)
+        assert Subscribe.objects.remove(user.id, author.id)
+        assert not Subscribe.objects.remove(user.id, author.id)
+
+
+class TestShoppingCartTotalQuerySet:
+
+    def test_add_and_remove_recipe(self, user, recipes):
+        ShoppingCart.objects.add_many(user.id, [recipes[0].id])
+        ShoppingCartTotal.objects.add_recipe(recipes[0].id, user.id)
+        assert totals(user) == {'Мука': 100, 'Сахар': 20}
+        ShoppingCart.objects.add_many(user.id, [recipes[1].id])
+        ShoppingCartTotal.objects.add_recipe(recipes[1].id, user.id)
+        assert totals(user) == {'Мука': 300, 'Сахар': 20, 'Соль': 5}
+        ShoppingCart.objects.remove_many(user.id, [recipes[0].id])
+        ShoppingCartTotal.objects.remove_recipe(recipes[0].id, user.id)
+        assert totals(user) == {'Мука': 200, 'Соль': 5}
+
+    def test_without_user_updates_every_cart(self, user, author, recipes):
+        for owner in (user, author):
+            ShoppingCart.objects.add_many(owner.id, [recipes[2].id])
+        ShoppingCartTotal.objects.add_recipe(recipes[2].id)
+        assert totals(user) == totals(author) == {'Сахар': 30}
+        ShoppingCartTotal.objects.remove_recipe(recipes[2].id)
+        assert totals(user) == totals(author) == {}
+
+    def test_rebuild(self, user, author, recipes):
+        ShoppingCart.objects.add_many(user.id, [recipe.id
+                                                for recipe in recipes])
+        ShoppingCart.objects.add_many(author.id, [recipes[1].id])
+        ShoppingCartTotal.objects.create(
+            user=author, ingredient=recipes[2].ingredients.get(), amount=999)
+        ShoppingCartTotal.objects.rebuild(user.id)
+        assert totals(user) == {'Мука': 300, 'Сахар': 50, 'Соль': 5}
+        assert totals(author) == {'Сахар': 999}
+        ShoppingCartTotal.objects.rebuild()
+        assert totals(author) == {'Мука': 200, 'Соль': 5}
+
+
+class TestSingleViews:
+
+    @pytest.mark.parametrize('model, url', (
+        (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')))
+    def test_add_and_remove(self, client, user, recipes, model, url):
+        recipe = recipes[0]
+        path = f'/api/recipes/{recipe.id}/{url}/'
+        assert client.post(path).status_code == 201
+        assert counters([recipe], model.counter_field) == [1]
+        assert client.post(path).status_code == 400
+        assert counters([recipe], model.counter_field) == [1]
+        assert model.objects.filter(user=user).count() == 1
+        assert client.delete(path).status_code == 204
+        assert counters([recipe], model.counter_field) == [0]
+        assert client.delete(path).status_code == 400
+        assert counters([recipe], model.counter_field) == [0]
+
+    @pytest.mark.parametrize('url', ('favorite', 'shopping_cart'))
+    def test_missing_recipe(self, client, url):
+        path = f'/api/recipes/{MISSING}/{url}/'
+        assert client.post(path).status_code == 404
+        assert client.delete(path).status_code == 404
+
+    def test_shopping_cart_totals(self, client, user, recipes):
+        client.post(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        assert totals(user) == {'Мука': 100, 'Сахар': 20}
+        client.post(f'/api/recipes/{recipes[1].id}/shopping_cart/')
+        assert totals(user) == {'Мука': 300, 'Сахар': 20, 'Соль': 5}
+        client.post(f'/api/recipes/{recipes[1].id}/shopping_cart/')
+        assert totals(user) == {'Мука': 300, 'Сахар': 20, 'Соль': 5}
+        client.delete(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        assert totals(user) == {'Мука': 200, 'Соль': 5}
+        client.delete(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        assert totals(user) == {'Мука': 200, 'Соль': 5}
+
+    def test_subscribe(self, client, user, author):
+        path = f'/api/users/{author.id}/subscribe/'
+        assert client.post(path).status_code == 201
+        assert client.post(path).status_code == 400
+        assert client.post(f'/api/users/{user.id}/subscribe/'
+                           ).status_code == 400
+        assert client.post(f'/api/users/{MISSING}/subscribe/'
+                           ).status_code == 404
+        assert client.delete(path).status_code == 204
+        assert client.delete(path).status_code == 400
+        assert client.delete(f'/api/users/{MISSING}/subscribe/'
+                             ).status_code == 404
+        assert not Subscribe.objects.filter(user=user).exists()
+
+
+class TestBatchViews:
+
+    @pytest.mark.parametrize('model, url', (
+        (Favorite, 'favorite'), (ShoppingCart, 'shopping_cart')))
+    def test_add_and_remove(self, client, user, recipes, model, url):
+        path = f'/api/recipes/{url}/batch/'
+        ids = [recipe.id for recipe in recipes]
+        client.post(path, {'ids': ids[:1]}, format='json')
+
+        response = client.post(path, {'ids': [*ids, ids[1], MISSING]},
+                               format='json')
+        assert response.status_code == 200
+        assert results(response) == {ids[0]: 400, ids[1]: 201, ids[2]: 201,
+                                     MISSING: 404}
+        assert len(response.data['results']) == 4
+        assert counters(recipes, model.counter_field) == [1, 1, 1]
+
+        response = client.delete(path, {'ids': [ids[0], ids[1], MISSING]},
+                                 format='json')
+        assert results(response) == {ids[0]: 204, ids[1]: 204,
+                                     MISSING: 404}
+        assert counters(recipes, model.counter_field) == [0, 0, 1]
+
+        response = client.delete(path, {'ids': ids}, format='json')
+        assert results(response) == {ids[0]: 400, ids[1]: 400, ids[2]: 204}
+        assert counters(recipes, model.counter_field) == [0, 0, 0]
+        assert not model.objects.filter(user=user).exists()
+
+    def test_shopping_cart_totals(self, client, user, recipes):
+        path = '/api/recipes/shopping_cart/batch/'
+        ids = [recipe.id for recipe in recipes]
+        client.post(path, {'ids': ids[:2]}, format='json')
+        assert totals(user) == {'Мука': 300, 'Сахар': 20, 'Соль': 5}
+        client.post(path, {'ids': ids}, format='json')
+        assert totals(user) == {'Мука': 300, 'Сахар': 50, 'Соль': 5}
+        client.delete(path, {'ids': [ids[0], MISSING]}, format='json')
+        assert totals(user) == {'Мука': 200, 'Сахар': 30, 'Соль': 5}
+        client.delete(path, {'ids': ids}, format='json')
+        assert totals(user) == {}
+
+    def test_subscribe(self, client, user, author):
+        path = '/api/users/subscribe/batch/'
+        other = create_user('other')
+        response = client.post(
+            path, {'ids': [author.id, user.id, MISSING, author.id]},
+            format='json')
+        assert results(response) == {author.id: 201, user.id: 400,
+                                     MISSING: 404}
+        response = client.post(path, {'ids': [author.id, other.id]},
+                               format='json')
+        assert results(response) == {author.id: 400, other.id: 201}
+        assert set(Subscribe.objects.filter(user=user).values_list(
+            'author', flat=True)) == {author.id, other.id}
+        response = client.delete(path, {'ids': [author.id, MISSING]},
+                                 format='json')
+        assert results(response) == {author.id: 204, MISSING: 404}
+        response = client.delete(path, {'ids': [author.id, other.id]},
+                                 format='json')
+        assert results(response) == {author.id: 400, other.id: 204}
+        assert not Subscribe.objects.filter(user=user).exists()
+
+    @pytest.mark.parametrize('data', ({}, {'ids': []}, {'ids': [0]},
+                                      {'ids': ['x']}))
+    def test_invalid_ids(self, client, data):
+        response = client.post('/api/recipes/favorite/batch/', data,
+                               format='json')
+        assert response.status_code == 400
+
+    def test_anonymous(self, recipes):
+        response = APIClient().post('/api/recipes/favorite/batch/',
+                                    {'ids': [recipes[0].id]}, format='json')
+        assert response.status_code == 401
+        assert counters(recipes, 'favorites_count') == [0, 0, 0]
+
+
+class TestRecipeIngredientChanges:
+    """Итоги списков покупок после правки ингредиентов рецепта."""
+
+    @pytest.fixture
+    def cart(self, client, recipes):
+        client.post(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        return recipes[0]
+
+    def test_orm_save(self, client, user, cart):
+        item = cart.recipe.get(ingredient__name='Мука')
+        item.amount = 150
+        item.save()
+        assert totals(user) == {'Мука': 150, 'Сахар': 20}
+        assert client.delete(
+            f'/api/recipes/{cart.id}/shopping_cart/').status_code == 204
+        assert totals(user) == {}
+
+    def test_orm_create_and_delete(self, user, cart, ingredients):
+        item = IngredientRecipe.objects.create(
+            recipe=cart, ingredient=ingredients[2], amount=7)
+        assert totals(user) == {'Мука': 100, 'Сахар': 20, 'Соль': 7}
+        item.delete()
+        cart.recipe.filter(ingredient__name='Сахар').delete()
+        assert totals(user) == {'Мука': 100}
+
+    def test_admin_inline_edit(self, client, user, cart):
+        admin = create_user('admin')
+        admin.is_staff = admin.is_superuser = True
+        admin.save()
+        admin_client = APIClient()
+        admin_client.force_login(admin)
+        items = list(cart.recipe.order_by('id'))
+        data = {
+            'name': cart.name, 'author': cart.author_id, 'text': cart.text,
+            'cooking_time': cart.cooking_time,
+            'tags': [Tag.objects.create(name='Обед', slug='lunch').id],
+            'recipe-TOTAL_FORMS': len(items),
+            'recipe-INITIAL_FORMS': len(items),
+            'recipe-MIN_NUM_FORMS': 0, 'recipe-MAX_NUM_FORMS': 1000,
+        }
+        for i, item in enumerate(items):
+            data.update({
+                f'recipe-{i}-id': item.id,
+                f'recipe-{i}-recipe': cart.id,
+                f'recipe-{i}-ingredient': item.ingredient_id,
+                f'recipe-{i}-amount': item.amount,
+            })
+        data['recipe-0-amount'] = 150
+        data['recipe-1-DELETE'] = 'on'
+        response = admin_client.post(
+            f'/admin/recipes/recipe/{cart.id}/change/', data)
+        assert response.status_code == 302
+        assert totals(user) == {'Мука': 150}
+        assert client.delete(
+            f'/api/recipes/{cart.id}/shopping_cart/').status_code == 204
+        assert totals(user) == {}
+
+    def test_api_update(self, settings, tmp_path, user, author, cart,
+                        ingredients):
+        settings.MEDIA_ROOT = tmp_path
+        response = token_client(author).patch(
+            f'/api/recipes/{cart.id}/',
+            {'ingredients': [{'id': ingredients[0].id, 'amount': 50},
+                             {'id': ingredients[2].id, 'amount': 3}],
+             'tags': [Tag.objects.create(name='Обед', slug='lunch').id],
+             'name': cart.name, 'text': cart.text, 'cooking_time': 5,
+             'image': IMAGE},
+            format='json')
+        assert response.status_code == 200, response.data
+        assert totals(user) == {'Мука': 50, 'Соль': 3}
+
+    def test_drifted_totals_are_clamped(self, client, user, cart):
+        IngredientRecipe.objects.filter(recipe=cart).update(amount=500)
+        assert client.delete(
+            f'/api/recipes/{cart.id}/shopping_cart/').status_code == 204
+        assert totals(user) == {}
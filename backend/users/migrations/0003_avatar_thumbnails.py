@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20241124_2122'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnails',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Миниатюры аватарки'),
+        ),
+    ]
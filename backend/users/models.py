@@ -1,8 +1,8 @@
 """Модели приложения users."""
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
-from django.db.models import Model, UniqueConstraint
+from django.db import connection, models
+from django.db.models import Model, QuerySet, UniqueConstraint
 
 from foodgram import constants
 
@@ -40,6 +40,15 @@ class User(AbstractUser):
         null=True,
         verbose_name='Аватарка',
     )
+    avatar_thumbnails = models.JSONField(
+        verbose_name='Миниатюры аватарки',
+        default=dict,
+        editable=False,
+    )
+
+    image_field = 'avatar'
+    thumbnails_field = 'avatar_thumbnails'
+    thumbnail_sizes = ('avatar',)
 
     class Meta:
         """Класс Meta для модели User."""
@@ -51,6 +60,66 @@ class User(AbstractUser):
         return self.username
 
 
+class UserLinkQuerySet(QuerySet):
+    """Связи пользователя с объектом, изменяемые одной командой.
+
+    Повторное добавление отсекается уникальным ограничением
+    (user, target_field), поэтому одновременные запросы не создают
+    дубликатов и не требуют предварительной проверки exists().
+    """
+
+    target_field = None
+
+    def add(self, user_id, target_id):
+        """Добавление связи: False, если она уже есть или объекта нет."""
+        return bool(self.add_many(user_id, [target_id]))
+
+    def remove(self, user_id, target_id):
+        """Удаление одной связи: False, если её не было."""
+        return bool(self.remove_many(user_id, [target_id]))
+
+    def add_many(self, user_id, target_ids):
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+        Возвращает множество id объектов, связи с которыми созданы.
+        """
+        if not target_ids:
+            return set()
+        table = self.model._meta.db_table
+        target = self.model._meta.get_field(self.target_field)
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, {target.column}) '
+                f'SELECT %s, id FROM {target.related_model._meta.db_table} '
+                f'WHERE id IN ({placeholders}) '
+                f'ON CONFLICT (user_id, {target.column}) DO NOTHING '
+                f'RETURNING {target.column}',
+                [user_id, *target_ids])
+            return {row[0] for row in cursor.fetchall()}
+
+    def remove_many(self, user_id, target_ids):
+        """DELETE ... RETURNING: множество id объектов удалённых связей."""
+        if not target_ids:
+            return set()
+        table = self.model._meta.db_table
+        column = self.model._meta.get_field(self.target_field).column
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} '
+                f'WHERE user_id = %s AND {column} IN ({placeholders}) '
+                f'RETURNING {column}',
+                [user_id, *target_ids])
+            return {row[0] for row in cursor.fetchall()}
+
+
+class SubscribeQuerySet(UserLinkQuerySet):
+    """Подписки на авторов."""
+
+    target_field = 'author'
+
+
 class Subscribe(Model):
     """Модель подписки на автора."""
     user = models.ForeignKey(
@@ -66,6 +135,8 @@ class Subscribe(Model):
         on_delete=models.CASCADE,
     )
 
+    objects = SubscribeQuerySet.as_manager()
+
     class Meta:
         """Класс Meta для модели Subscribe."""
         ordering = ['user']